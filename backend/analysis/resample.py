@@ -0,0 +1,57 @@
+"""Aggregation of candles into coarser timeframes on Binance bucket boundaries."""
+
+import numpy as np
+
+# interval -> (bucket seconds, bucket offset from the Unix epoch)
+# Binance weeks start on Monday 00:00 UTC; the epoch was a Thursday.
+BUCKETS = {
+    "4h": (4 * 3600, 0),
+    "1d": (86400, 0),
+    "1w": (7 * 86400, 4 * 86400),
+}
+
+
+def bucket_start(ts, interval: str):
+    """Open time (seconds) of the interval bucket containing ts.
+
+    ts may be an int or a numpy array of them.
+    """
+    seconds, offset = BUCKETS[interval]
+    return (ts - offset) // seconds * seconds + offset
+
+
+def resample_candles(candles: list[dict], interval: str, drop_partial_first: bool = False) -> list[dict]:
+    """Aggregate time-sorted {time, open, high, low, close, volume} candles.
+
+    With drop_partial_first, a leading bucket whose first base candle does
+    not start on the bucket boundary is dropped (its history is incomplete).
+    """
+    n = len(candles)
+    if n == 0:
+        return []
+    t = np.fromiter((c["time"] for c in candles), dtype=np.int64, count=n)
+    o = np.fromiter((c["open"] for c in candles), dtype=np.float64, count=n)
+    h = np.fromiter((c["high"] for c in candles), dtype=np.float64, count=n)
+    lo = np.fromiter((c["low"] for c in candles), dtype=np.float64, count=n)
+    cl = np.fromiter((c["close"] for c in candles), dtype=np.float64, count=n)
+    v = np.fromiter((c["volume"] for c in candles), dtype=np.float64, count=n)
+
+    buckets = bucket_start(t, interval)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:] - 1, n - 1]
+
+    rows = zip(
+        buckets[starts].tolist(),
+        o[starts].tolist(),
+        np.maximum.reduceat(h, starts).tolist(),
+        np.minimum.reduceat(lo, starts).tolist(),
+        cl[ends].tolist(),
+        np.add.reduceat(v, starts).tolist(),
+    )
+    result = [
+        {"time": bt, "open": bo, "high": bh, "low": bl, "close": bc, "volume": bv}
+        for bt, bo, bh, bl, bc, bv in rows
+    ]
+    if drop_partial_first and t[0] != buckets[0]:
+        result = result[1:]
+    return result
@@ -2,6 +2,16 @@
 
 from collections import deque
 import time
+import warnings
+
+import numpy as np
+
+from config import (
+    VOLUME_ANOMALY_STD_MULTIPLIER,
+    VOLUME_HISTORY_POINTS,
+    VOLUME_BURST_MIN_SAMPLES,
+)
+from backend.services.coin_registry import binance_symbol
 
 # Rolling history for volume baseline calculation
 _volume_history: dict[str, deque] = {}
@@ -50,15 +60,125 @@ def detect_anomaly(coin_id: str, current_volume: float, market_cap: float) -> di
     }
 
 
-def scan_all_anomalies(coins: list[dict]) -> list[dict]:
-    """Scan all coins for volume anomalies. Returns only anomalous ones."""
+class VolumeSampleStore:
+    """Per-pair interval volumes derived from rolling 24h ticker samples.
+
+    Every pair owns one row of a 2-D float array used as a ring buffer; each
+    sample writes one column for all pairs at once. The volume traded in an
+    interval is estimated from the change of the rolling 24h total plus the
+    share that rolled out of the window, assumed to be the 24h average rate.
+    """
+
+    def __init__(self, points: int = VOLUME_HISTORY_POINTS):
+        self.points = points
+        self._rows: dict[str, int] = {}
+        self._values = np.full((0, points), np.nan)
+        self._last_totals = np.full(0, np.nan)
+        self._last_time: float | None = None
+        self._pos = 0
+        self.samples = 0
+        self.interval = 0.0
+
+    def _grow(self, symbols: list[str]):
+        for symbol in symbols:
+            self._rows[symbol] = len(self._rows)
+        pad = len(self._rows) - len(self._last_totals)
+        self._values = np.vstack([self._values, np.full((pad, self.points), np.nan)])
+        self._last_totals = np.r_[self._last_totals, np.full(pad, np.nan)]
+
+    def record(self, totals: dict[str, float], ts: float):
+        """Add one sample of {pair: rolling 24h quote volume} taken at ts."""
+        new = [s for s in totals if s not in self._rows]
+        if new:
+            self._grow(new)
+        current = np.full(len(self._rows), np.nan)
+        rows = np.fromiter((self._rows[s] for s in totals), dtype=np.int64, count=len(totals))
+        current[rows] = np.fromiter(totals.values(), dtype=np.float64, count=len(totals))
+
+        if self._last_time is not None and ts > self._last_time:
+            self.interval = ts - self._last_time
+            rolled_off = self._last_totals * (self.interval / 86400)
+            # Pairs missing from either sample stay NaN
+            self._values[:, self._pos] = np.maximum(current - self._last_totals + rolled_off, 0.0)
+            self._pos = (self._pos + 1) % self.points
+            self.samples += 1
+        self._last_totals = current
+        self._last_time = ts
+
+    def bursts(self, min_samples: int = VOLUME_BURST_MIN_SAMPLES) -> dict[str, dict]:
+        """Latest interval volume of each pair against its own baseline."""
+        if self.samples < 2:
+            return {}
+        latest_col = (self._pos - 1) % self.points
+        latest = self._values[:, latest_col]
+        history = np.delete(self._values[:, :min(self.samples, self.points)], latest_col, axis=1)
+        counts = np.count_nonzero(~np.isnan(history), axis=1)
+        with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN rows
+            mean = np.nanmean(history, axis=1)
+            std = np.nanstd(history, axis=1)
+            deviation = np.where(std > 0, (latest - mean) / std, 0.0)
+
+        ok = (counts >= min_samples) & ~np.isnan(latest)
+        return {
+            symbol: {
+                "volume": round(float(latest[i]), 2),
+                "baseline": round(float(mean[i]), 2),
+                "deviation": round(float(deviation[i]), 2),
+            }
+            for symbol, i in self._rows.items()
+            if ok[i]
+        }
+
+    def stats(self) -> dict:
+        return {
+            "pairs": len(self._rows),
+            "samples": self.samples,
+            "interval": round(self.interval, 1),
+            "bytes": self._values.nbytes + self._last_totals.nbytes,
+        }
+
+
+# Fed by the leader's volume sampler
+volume_samples = VolumeSampleStore()
+
+
+def _burst_anomaly(coin: dict, burst: dict, interval: float) -> dict:
+    """Anomaly record from a sampled burst; volume fields stay 24h figures."""
+    per_day = 86400 / interval if interval else 0
+    return {
+        "coin_id": coin.get("id", ""),
+        "current_volume": coin.get("total_volume", 0),
+        # 24h volume the pair would trade at its baseline interval rate
+        "baseline_volume": round(burst["baseline"] * per_day, 0),
+        "deviation_multiple": burst["deviation"],
+        "is_anomaly": burst["deviation"] > VOLUME_ANOMALY_STD_MULTIPLIER,
+        "interval_volume": burst["volume"],
+        "baseline_interval_volume": burst["baseline"],
+        "window_seconds": interval,
+    }
+
+
+def scan_all_anomalies(coins: list[dict], bursts: dict | None = None) -> list[dict]:
+    """Scan all coins for volume anomalies. Returns only anomalous ones.
+
+    bursts ({"pairs": {pair: ...}, "interval": seconds}, from the volume
+    sampler) replaces the 24h-volume check for coins traded on Binance.
+    """
+    pairs = (bursts or {}).get("pairs", {})
     anomalies = []
     for coin in coins:
-        result = detect_anomaly(
-            coin_id=coin.get("id", ""),
-            current_volume=coin.get("total_volume", 0),
-            market_cap=coin.get("market_cap", 1),
-        )
+        coin_id = coin.get("id", "")
+        symbol = binance_symbol(coin_id)
+        burst = pairs.get(f"{symbol}USDT") if symbol else None
+        if burst is not None:
+            result = _burst_anomaly(coin, burst, bursts["interval"])
+        else:
+            result = detect_anomaly(
+                coin_id=coin_id,
+                current_volume=coin.get("total_volume", 0),
+                market_cap=coin.get("market_cap", 1),
+            )
         if result["is_anomaly"]:
             result["symbol"] = coin.get("symbol", "").upper()
             result["name"] = coin.get("name", "")
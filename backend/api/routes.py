@@ -3,27 +3,46 @@
 import asyncio
 from datetime import datetime, timezone
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 
 from config import SIGNAL_COINS_COUNT, TOP_MOVERS_COUNT, BINANCE_SYMBOL_MAP, SOLANA_SUBCATEGORIES
 from backend.services.coingecko import fetch_top_coins, fetch_global, fetch_ohlc, fetch_coin_detail, fetch_solana_coins
 from backend.services.binance import fetch_klines, coingecko_id_to_binance, fetch_top_derivatives
 from backend.services.fear_greed import fetch_fear_greed
 from backend.services.whale_tracker import fetch_whale_transactions, enrich_whale_data
-from backend.services.news_sentiment import fetch_crypto_news, get_overall_sentiment
+from backend.services.news_sentiment import (
+    fetch_crypto_news,
+    get_overall_sentiment,
+    fetch_coin_news_sentiment,
+    pick_coin_sentiment,
+)
 from backend.services.social_sentiment import get_social_overview, get_coin_social
 from backend.services.funding_arbitrage import fetch_arbitrage_data
 from backend.analysis.indicators import ohlc_to_dataframe, klines_to_dataframe, compute_all_indicators
 from backend.analysis.signals import generate_composite_signal
-from backend.analysis.volume_anomaly import scan_all_anomalies
+from backend.analysis.volume_anomaly import scan_all_anomalies, volume_samples
 from backend.analysis.derivatives import get_derivatives_summary
 from backend.analysis.market_score import compute_market_score
 from backend.cache.memory_cache import cache
+from backend.cache.response_cache import response_cache, cacheable
+from backend.services.circuit_breaker import breaker_stats
+from backend.services.quota import quota_stats
+from backend.services.http_client import request_stats
+from backend.services import json_decode
+from backend.services.binance_stream import stream_stats
+from backend.services.coin_registry import is_known, has_futures, registry_stats
 
 router = APIRouter()
 
 
-@router.get("/market/overview")
+def _require_known(coin_id: str):
+    """Reject ids CoinGecko does not list before any upstream call."""
+    if not is_known(coin_id):
+        raise HTTPException(status_code=404, detail=f"Unknown coin id: {coin_id}")
+
+
+@router.get("/market/overview", dependencies=[Depends(cacheable)])
 async def market_overview():
     """Global market stats + Fear/Greed + market score."""
     global_data, fear_greed, news_sentiment, top_coins = await asyncio.gather(
@@ -64,13 +83,17 @@ async def market_overview():
 
 
 @router.get("/market/coins")
-async def market_coins():
+async def market_coins(request: Request):
     """Top 50 coins with prices, volumes, changes."""
+    return await response_cache.serve(request, _build_market_coins)
+
+
+async def _build_market_coins():
     coins = await fetch_top_coins()
     return coins or []
 
 
-@router.get("/market/movers")
+@router.get("/market/movers", dependencies=[Depends(cacheable)])
 async def market_movers():
     """Top gainers and losers by 24h change."""
     coins = await fetch_top_coins()
@@ -93,14 +116,19 @@ async def market_movers():
 
 
 @router.get("/signals")
-async def get_signals():
+async def get_signals(request: Request):
     """Compute signals for top N coins."""
+    return await response_cache.serve(request, _build_signals)
+
+
+async def _build_signals():
     coins = await fetch_top_coins()
     if not coins:
         return []
 
     fear_greed = await fetch_fear_greed(limit=1)
     news_sentiment = await get_overall_sentiment()
+    coin_news = await fetch_coin_news_sentiment()
 
     signal_coins = coins[:SIGNAL_COINS_COUNT]
     results = []
@@ -130,8 +158,7 @@ async def get_signals():
 
         # Get derivatives data for this coin
         deriv_data = None
-        binance_symbol = coingecko_id_to_binance(coin_id)
-        if binance_symbol:
+        if has_futures(coin_id):
             try:
                 derivs = await fetch_top_derivatives([coin_id])
                 if derivs:
@@ -142,7 +169,7 @@ async def get_signals():
         signal = generate_composite_signal(
             indicators=indicators,
             fear_greed=fear_greed,
-            news_sentiment=news_sentiment,
+            news_sentiment=pick_coin_sentiment(coin_news, coin_id, news_sentiment),
             derivatives=deriv_data,
         )
 
@@ -169,16 +196,18 @@ async def get_signals():
 @router.get("/signals/{coin_id}")
 async def get_coin_signal(coin_id: str):
     """Detailed signal for a specific coin."""
+    _require_known(coin_id)
     coins = await fetch_top_coins()
     coin = next((c for c in (coins or []) if c["id"] == coin_id), None)
 
     indicators = await _compute_coin_indicators(coin_id)
     fear_greed = await fetch_fear_greed(limit=1)
     news_sentiment = await get_overall_sentiment()
+    coin_news = await fetch_coin_news_sentiment()
+    news_sentiment = pick_coin_sentiment(coin_news, coin_id, news_sentiment)
 
     deriv_data = None
-    binance_symbol = coingecko_id_to_binance(coin_id)
-    if binance_symbol:
+    if has_futures(coin_id):
         try:
             derivs = await fetch_top_derivatives([coin_id])
             if derivs:
@@ -218,12 +247,13 @@ async def get_coin_signal(coin_id: str):
     }
 
 
-@router.get("/ohlc/{coin_id}")
+@router.get("/ohlc/{coin_id}", dependencies=[Depends(cacheable)])
 async def get_ohlc(coin_id: str, interval: str = "4h", days: int = 14):
     """OHLC chart data for a coin.
 
     Supported intervals: 1h, 4h, 1d, 1w.
     """
+    _require_known(coin_id)
     # Map interval to Binance format and appropriate limit/days
     interval_config = {
         "1h": {"binance": "1h", "limit": 168, "cg_days": 7},
@@ -258,10 +288,11 @@ async def volume_anomalies():
     coins = await fetch_top_coins()
     if not coins:
         return []
-    return scan_all_anomalies(coins)
+    # Interval volumes from the leader's sampler; 24h volumes until it has a baseline
+    return scan_all_anomalies(coins, cache.get("volume_bursts"))
 
 
-@router.get("/derivatives/overview")
+@router.get("/derivatives/overview", dependencies=[Depends(cacheable)])
 async def derivatives_overview():
     """Derivatives data for top coins with Binance futures."""
     top_derivative_coins = list(BINANCE_SYMBOL_MAP.keys())[:15]
@@ -285,7 +316,7 @@ async def whales_recent():
     return txs or []
 
 
-@router.get("/sentiment")
+@router.get("/sentiment", dependencies=[Depends(cacheable)])
 async def sentiment():
     """News sentiment + Fear/Greed trend."""
     news, fg = await asyncio.gather(
@@ -301,6 +332,15 @@ async def sentiment():
     }
 
 
+@router.get("/sentiment/fear-greed", dependencies=[Depends(cacheable)])
+async def fear_greed_history(limit: int = 365, start: int | None = None, end: int | None = None):
+    """Fear & Greed history for long-horizon charts.
+
+    limit: latest N days (0 = all); start/end: Unix timestamps bounding the range.
+    """
+    return await fetch_fear_greed(limit=max(limit, 0), start=start, end=end) or {}
+
+
 @router.get("/social/overview")
 async def social_overview():
     """Social sentiment overview - trending topics + community stats."""
@@ -310,19 +350,28 @@ async def social_overview():
 @router.get("/social/coin/{coin_id}")
 async def social_coin(coin_id: str):
     """Social data for a specific coin."""
+    _require_known(coin_id)
     return await get_coin_social(coin_id)
 
 
 @router.get("/arbitrage")
-async def arbitrage():
+async def arbitrage(request: Request):
     """Funding rate arbitrage opportunities from Binance Futures."""
+    return await response_cache.serve(request, _build_arbitrage)
+
+
+async def _build_arbitrage():
     data = await fetch_arbitrage_data()
     return data or []
 
 
 @router.get("/market/solana")
-async def market_solana():
+async def market_solana(request: Request):
     """Top Solana ecosystem coins with sub-category tags."""
+    return await response_cache.serve(request, _build_market_solana)
+
+
+async def _build_market_solana():
     coins = await fetch_solana_coins()
     if not coins:
         return []
@@ -331,9 +380,10 @@ async def market_solana():
     return coins
 
 
-@router.get("/coin/{coin_id}")
+@router.get("/coin/{coin_id}", dependencies=[Depends(cacheable)])
 async def coin_detail(coin_id: str):
     """Detailed info for a specific coin."""
+    _require_known(coin_id)
     detail = await fetch_coin_detail(coin_id)
     if not detail:
         return {}
@@ -369,10 +419,44 @@ async def health():
     return {
         "status": "ok",
         "cache": cache.stats(),
+        "response_cache": response_cache.stats(),
+        "circuits": breaker_stats(),
+        "quotas": quota_stats(),
+        "requests": request_stats(),
+        "json_decode": json_decode.decode_stats(),
+        "binance_stream": stream_stats(),
+        "volume_samples": volume_samples.stats(),
+        "coin_registry": registry_stats(),
         "timestamp": datetime.now(timezone.utc).isoformat(),
     }
 
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Cache, response cache, circuit, quota and decode metrics in Prometheus text format."""
+    lines = cache.metrics.prometheus_lines()
+    rc = response_cache.stats()
+    lines.append("# TYPE bedava_response_cache_hits_total counter")
+    lines.append(f"bedava_response_cache_hits_total {rc['hits']}")
+    lines.append("# TYPE bedava_response_cache_misses_total counter")
+    lines.append(f"bedava_response_cache_misses_total {rc['misses']}")
+    lines.append("# TYPE bedava_circuit_open gauge")
+    for name, b in breaker_stats().items():
+        lines.append(f'bedava_circuit_open{{upstream="{name}"}} {int(b["state"] != "closed")}')
+    quotas = quota_stats()
+    lines.append("# TYPE bedava_quota_tokens gauge")
+    for name, q in quotas.items():
+        lines.append(f'bedava_quota_tokens{{upstream="{name}"}} {q["tokens"]}')
+    lines.append("# TYPE bedava_quota_queued gauge")
+    for name, q in quotas.items():
+        lines.append(f'bedava_quota_queued{{upstream="{name}"}} {q["queued"]}')
+    lines.append("# TYPE bedava_quota_throttled_total counter")
+    for name, q in quotas.items():
+        lines.append(f'bedava_quota_throttled_total{{upstream="{name}"}} {q["throttled"]}')
+    lines += json_decode.prometheus_lines()
+    return "\n".join(lines) + "\n"
+
+
 async def _compute_coin_indicators(coin_id: str) -> dict | None:
     """Compute technical indicators for a coin, trying Binance then CoinGecko."""
     # Try Binance klines first (has volume data)
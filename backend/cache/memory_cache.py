@@ -1,9 +1,44 @@
 """In-memory TTL cache with rate-limit awareness."""
 
 import asyncio
+import itertools
+import sys
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field
-from typing import Any, Callable, Coroutine
+from typing import Any, Awaitable, Callable, Coroutine
+
+from config import (
+    CACHE_STALE_WHILE_REVALIDATE,
+    CACHE_MAX_STALENESS,
+    CACHE_MAX_BYTES,
+    CACHE_NEGATIVE_TTL,
+)
+from backend.cache.metrics import CacheMetrics
+
+
+# Monotonic version stamped on every stored entry; changes whenever data does
+_versions = itertools.count(1)
+
+# Cache keys (and versions) read while building the current response
+_tracked: ContextVar[dict[str, int] | None] = ContextVar("cache_tracked", default=None)
+
+
+def estimate_size(data: Any) -> int:
+    """Rough deep size of a JSON-like value in bytes."""
+    size = 0
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
 
 
 @dataclass
@@ -11,74 +46,361 @@ class CacheEntry:
     data: Any
     fetched_at: float
     ttl: float
+    size: int = 0
+    version: int = field(default_factory=lambda: next(_versions))
+    # Loaded from a snapshot; served as stale until the first refresh attempt
+    # finishes, after which the usual max staleness applies
+    restored: bool = False
+    # Published by the leader (on a follower); the leader keeps it fresh
+    shared: bool = False
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
 
     @property
     def is_expired(self) -> bool:
-        return (time.time() - self.fetched_at) > self.ttl
+        return self.age > self.ttl
+
+    def is_servable(self, max_staleness: float) -> bool:
+        """Whether the entry may still be served while a refresh runs."""
+        return self.age <= self.ttl + max_staleness
 
 
 class MemoryCache:
-    def __init__(self):
-        self._store: dict[str, CacheEntry] = {}
+    def __init__(
+        self,
+        stale_while_revalidate: bool = CACHE_STALE_WHILE_REVALIDATE,
+        max_staleness: float = CACHE_MAX_STALENESS,
+        max_bytes: int = CACHE_MAX_BYTES,
+        negative_ttl: float = CACHE_NEGATIVE_TTL,
+    ):
+        # Ordered by recency of use; the first entry is evicted first
+        self._store: OrderedDict[str, CacheEntry] = OrderedDict()
         self._locks: dict[str, asyncio.Lock] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+        # key -> time until which a failed fetch is not retried
+        self._failed_until: dict[str, float] = {}
+        self._bytes = 0
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_staleness = max_staleness
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        # Follower workers leave refreshing restored entries to the leader
+        self.read_only = False
+        # Set on followers: asks the leader for a key it lacks and stores the
+        # answer here; returns whether the leader had a newer copy. Raises if
+        # the leader is unreachable.
+        self.miss_handler: Callable[[str], Awaitable[bool]] | None = None
+        # Version of the most recently stored entry; changes on every write
+        self.last_version = 0
+        self.metrics = CacheMetrics()
 
     def _get_lock(self, key: str) -> asyncio.Lock:
         if key not in self._locks:
             self._locks[key] = asyncio.Lock()
         return self._locks[key]
 
-    def get(self, key: str) -> Any | None:
+    def _touch(self, key: str) -> CacheEntry | None:
+        """Look up an entry and mark it as most recently used."""
         entry = self._store.get(key)
+        if entry is not None:
+            self._store.move_to_end(key)
+            tracked = _tracked.get()
+            if tracked is not None:
+                tracked[key] = entry.version
+        return entry
+
+    @contextmanager
+    def track(self):
+        """Collect {key: version} of every entry read inside the block.
+
+        Nested blocks also report their reads to the enclosing one.
+        """
+        parent = _tracked.get()
+        tracked: dict[str, int] = {}
+        token = _tracked.set(tracked)
+        try:
+            yield tracked
+        finally:
+            _tracked.reset(token)
+            if parent is not None:
+                parent.update(tracked)
+
+    def record_reads(self, versions: dict[str, int]):
+        """Report reads served from elsewhere (e.g. a rendered response) to track()."""
+        tracked = _tracked.get()
+        if tracked is not None:
+            tracked.update(versions)
+
+    def remaining_ttl(self, keys) -> float | None:
+        """Seconds until the first of these entries expires (0 if any already has)."""
+        remaining = None
+        for key in keys:
+            entry = self._store.get(key)
+            if entry is None:
+                continue
+            left = max(0.0, entry.ttl - entry.age)
+            remaining = left if remaining is None else min(remaining, left)
+        return remaining
+
+    def is_current(self, versions: dict[str, int]) -> bool:
+        """Whether every tracked entry is unchanged and still fresh."""
+        for key, version in versions.items():
+            entry = self._store.get(key)
+            if entry is None or entry.version != version or entry.is_expired:
+                return False
+        return True
+
+    def get(self, key: str) -> Any | None:
+        entry = self._touch(key)
         if entry is None or entry.is_expired:
             return None
         return entry.data
 
-    def set(self, key: str, data: Any, ttl: float):
-        self._store[key] = CacheEntry(data=data, fetched_at=time.time(), ttl=ttl)
+    def set(self, key: str, data: Any, ttl: float, size: int | None = None):
+        """Store data; pass size when the caller can estimate it more cheaply."""
+        entry = CacheEntry(
+            data=data, fetched_at=time.time(), ttl=ttl,
+            size=estimate_size(data) if size is None else size,
+        )
+        self._discard(key)
+        self._store[key] = entry
+        self._bytes += entry.size
+        self.metrics.resize(key, 1, entry.size)
+        self.last_version = entry.version
+        self._enforce_budget(keep=key)
+        tracked = _tracked.get()
+        if tracked is not None:
+            tracked[key] = entry.version
+
+    def peek(self, key: str) -> CacheEntry | None:
+        """Look up an entry without marking it used or reporting the read."""
+        return self._store.get(key)
 
     def get_even_if_stale(self, key: str) -> Any | None:
-        entry = self._store.get(key)
+        entry = self._touch(key)
         if entry is None:
             return None
         return entry.data
 
+    def restore(self, key: str, data: Any, fetched_at: float, ttl: float, shared: bool = False):
+        """Insert an entry from a snapshot, keeping its original fetch time.
+
+        shared marks a copy published by the leader rather than a snapshot.
+        Entries already held with the same or a newer fetch time win.
+        """
+        existing = self._store.get(key)
+        if existing is not None and existing.fetched_at >= fetched_at:
+            return
+        entry = CacheEntry(
+            data=data, fetched_at=fetched_at, ttl=ttl,
+            size=estimate_size(data), restored=not shared, shared=shared,
+        )
+        self._discard(key)
+        self._store[key] = entry
+        self._bytes += entry.size
+        self.metrics.resize(key, 1, entry.size)
+        self.last_version = entry.version
+        self._enforce_budget(keep=key)
+
+    def entries(self) -> list[tuple[str, CacheEntry]]:
+        """All entries, most recently used first."""
+        return list(reversed(self._store.items()))
+
+    def _discard(self, key: str):
+        entry = self._store.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self.metrics.resize(key, -1, -entry.size)
+
+    def _enforce_budget(self, keep: str):
+        """Evict dead entries, then least recently used ones, until under budget."""
+        if self._bytes <= self.max_bytes:
+            return
+
+        # Entries past max staleness can never be served again; drop them first
+        for key in [k for k, e in self._store.items()
+                    if k != keep and not e.is_servable(self.max_staleness)]:
+            self._discard(key)
+
+        while self._bytes > self.max_bytes and len(self._store) > 1:
+            oldest = next(iter(self._store))
+            if oldest == keep:
+                self._store.move_to_end(keep)
+                continue
+            self._discard(oldest)
+
+        self._prune_locks()
+
+    def _recently_failed(self, key: str) -> bool:
+        until = self._failed_until.get(key)
+        if until is None:
+            return False
+        if time.time() >= until:
+            del self._failed_until[key]
+            return False
+        return True
+
+    def _record_failure(self, key: str):
+        now = time.time()
+        if len(self._failed_until) > 1024:
+            self._failed_until = {k: t for k, t in self._failed_until.items() if t > now}
+        self._failed_until[key] = now + self.negative_ttl
+
+    def _prune_locks(self):
+        """Drop locks that nobody holds or waits on and whose key is gone."""
+        # A released lock reads as unlocked until its woken waiter runs, so
+        # queued waiters must be checked too (asyncio.Lock has no public API)
+        for key in [k for k, lock in self._locks.items()
+                    if not lock.locked() and not lock._waiters and k not in self._store]:
+            del self._locks[key]
+
     async def get_or_fetch(
         self,
         key: str,
         ttl: float,
         fetch_fn: Callable[[], Coroutine[Any, Any, Any]],
     ) -> Any | None:
-        cached = self.get(key)
-        if cached is not None:
-            return cached
+        stats = self.metrics.family(key)
+        entry = self._touch(key)
+        if entry is not None and not entry.is_expired:
+            stats.hits += 1
+            return entry.data
+
+        # Stale-while-revalidate: answer with the expired entry right away and
+        # let a single background task refresh it, until max staleness is hit.
+        # Entries restored from a snapshot are served this way regardless of
+        # age until their first refresh attempt finishes.
+        if entry is not None and (
+            entry.restored
+            or (self.stale_while_revalidate and entry.is_servable(self.max_staleness))
+        ):
+            # A follower waits for the leader to publish a newer copy, unless
+            # the leader has stopped refreshing this key altogether
+            if not (self.read_only and (entry.shared or entry.restored)
+                    and entry.is_servable(self.max_staleness)):
+                self._schedule_refresh(key, ttl, fetch_fn)
+            stats.stale_serves += 1
+            return entry.data
+
+        # Negative cache: don't hit an upstream that just failed for this key
+        if self._recently_failed(key):
+            stats.negative_hits += 1
+            return self.get_even_if_stale(key)
 
         lock = self._get_lock(key)
+        wait_started = time.perf_counter()
         async with lock:
+            stats.lock_wait_seconds += time.perf_counter() - wait_started
             # Double-check after acquiring lock
             cached = self.get(key)
             if cached is not None:
+                stats.hits += 1
                 return cached
+            if self._recently_failed(key):
+                stats.negative_hits += 1
+                return self.get_even_if_stale(key)
+
+            stats.misses += 1
+            data = await self._fetch_and_store(key, ttl, fetch_fn)
+
+        # Failed fetches for unknown keys leave an idle lock behind
+        if len(self._locks) > 2 * len(self._store) + 64:
+            self._prune_locks()
+        return data
 
+    async def _fetch_and_store(
+        self,
+        key: str,
+        ttl: float,
+        fetch_fn: Callable[[], Coroutine[Any, Any, Any]],
+    ) -> Any | None:
+        # Followers get misses from the leader so upstream traffic (and its
+        # quota) stays in one process; fetch locally only if it is unreachable
+        if self.read_only and self.miss_handler is not None:
             try:
-                data = await fetch_fn()
-                if data is not None:
-                    self.set(key, data, ttl)
-                return data
+                found = await self.miss_handler(key)
             except Exception:
-                # Return stale data if available
+                pass
+            else:
+                if not found:
+                    self._record_failure(key)
                 return self.get_even_if_stale(key)
 
+        started = time.perf_counter()
+        try:
+            data = await fetch_fn()
+            self.metrics.observe_fetch(key, time.perf_counter() - started, failed=False)
+            self._failed_until.pop(key, None)
+            if data is not None:
+                self.set(key, data, ttl)
+            return data
+        except Exception:
+            self.metrics.observe_fetch(key, time.perf_counter() - started, failed=True)
+            self._record_failure(key)
+            # Return stale data if available
+            return self.get_even_if_stale(key)
+
+    def _schedule_refresh(
+        self,
+        key: str,
+        ttl: float,
+        fetch_fn: Callable[[], Coroutine[Any, Any, Any]],
+    ):
+        """Start a background refresh for key unless one is already running."""
+        task = self._refreshing.get(key)
+        if (task is not None and not task.done()) or self._recently_failed(key):
+            return
+
+        task = asyncio.create_task(self._refresh(key, ttl, fetch_fn))
+        self._refreshing[key] = task
+
+        def _done(t: asyncio.Task):
+            if self._refreshing.get(key) is t:
+                del self._refreshing[key]
+
+        task.add_done_callback(_done)
+
+    async def _refresh(
+        self,
+        key: str,
+        ttl: float,
+        fetch_fn: Callable[[], Coroutine[Any, Any, Any]],
+    ):
+        # Runs detached from the request that spawned it; don't report into it
+        _tracked.set(None)
+        async with self._get_lock(key):
+            # A blocking caller may have refreshed the entry meanwhile
+            if self.get(key) is not None:
+                return
+            try:
+                await self._fetch_and_store(key, ttl, fetch_fn)
+            finally:
+                # Whatever the attempt returned (even None), a restored entry
+                # is now subject to max staleness like any other
+                entry = self._store.get(key)
+                if entry is not None:
+                    entry.restored = False
+
     def clear(self):
         self._store.clear()
+        self._failed_until.clear()
+        self._bytes = 0
+        for stats in self.metrics.families.values():
+            stats.entries = stats.bytes = 0
+        self._prune_locks()
 
     def stats(self) -> dict:
-        now = time.time()
-        total = len(self._store)
-        fresh = sum(1 for e in self._store.values() if not e.is_expired)
+        """Cheap summary from incrementally kept counters (no store walk)."""
         return {
-            "total_entries": total,
-            "fresh_entries": fresh,
-            "stale_entries": total - fresh,
+            "total_entries": len(self._store),
+            "refreshing": len(self._refreshing),
+            "failed_keys": len(self._failed_until),
+            "locks": len(self._locks),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "families": self.metrics.summary(),
         }
 
 
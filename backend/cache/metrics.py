@@ -0,0 +1,124 @@
+"""Incremental cache counters grouped by key family."""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from config import CACHE_KEY_FAMILIES
+
+# Upper bounds (seconds) of the fetch-duration histogram buckets
+FETCH_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+@lru_cache(maxsize=4096)
+def key_family(key: str) -> str:
+    for prefix in CACHE_KEY_FAMILIES:
+        if key.startswith(prefix):
+            return prefix
+    return "other"
+
+
+@dataclass
+class FamilyStats:
+    hits: int = 0
+    misses: int = 0
+    stale_serves: int = 0
+    negative_hits: int = 0
+    fetch_errors: int = 0
+    lock_wait_seconds: float = 0.0
+    fetch_seconds: float = 0.0
+    # One count per FETCH_DURATION_BUCKETS bound, plus +Inf
+    fetch_buckets: list[int] = field(
+        default_factory=lambda: [0] * (len(FETCH_DURATION_BUCKETS) + 1)
+    )
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def fetches(self) -> int:
+        return sum(self.fetch_buckets)
+
+    def summary(self) -> dict:
+        lookups = self.hits + self.misses + self.stale_serves + self.negative_hits
+        fetches = self.fetches
+        return {
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_serves": self.stale_serves,
+            "negative_hits": self.negative_hits,
+            "hit_ratio": round((self.hits + self.stale_serves) / lookups, 3) if lookups else None,
+            "fetches": fetches,
+            "fetch_errors": self.fetch_errors,
+            "avg_fetch_ms": round(self.fetch_seconds / fetches * 1000, 1) if fetches else None,
+            "lock_wait_ms": round(self.lock_wait_seconds * 1000, 1),
+        }
+
+
+class CacheMetrics:
+    def __init__(self):
+        self.families: dict[str, FamilyStats] = {}
+
+    def family(self, key: str) -> FamilyStats:
+        name = key_family(key)
+        stats = self.families.get(name)
+        if stats is None:
+            stats = self.families[name] = FamilyStats()
+        return stats
+
+    def observe_fetch(self, key: str, seconds: float, failed: bool):
+        stats = self.family(key)
+        stats.fetch_seconds += seconds
+        if failed:
+            stats.fetch_errors += 1
+        for i, bound in enumerate(FETCH_DURATION_BUCKETS):
+            if seconds <= bound:
+                stats.fetch_buckets[i] += 1
+                break
+        else:
+            stats.fetch_buckets[-1] += 1
+
+    def resize(self, key: str, entries: int, size: int):
+        stats = self.family(key)
+        stats.entries += entries
+        stats.bytes += size
+
+    def summary(self) -> dict:
+        return {name: s.summary() for name, s in sorted(self.families.items())}
+
+    def prometheus_lines(self) -> list[str]:
+        """Render counters in the Prometheus text exposition format."""
+        lines = []
+        counters = [
+            ("hits", "Fresh cache hits"),
+            ("misses", "Lookups that had to fetch upstream"),
+            ("stale_serves", "Expired entries served while revalidating"),
+            ("negative_hits", "Lookups short-circuited by a recent failure"),
+            ("fetch_errors", "Failed upstream fetches"),
+            ("lock_wait_seconds", "Time spent waiting on per-key locks"),
+        ]
+        for attr, help_text in counters:
+            name = f"bedava_cache_{attr}_total"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for family, s in sorted(self.families.items()):
+                lines.append(f'{name}{{family="{family}"}} {getattr(s, attr)}')
+
+        for attr, help_text in [("entries", "Entries held"), ("bytes", "Estimated bytes held")]:
+            name = f"bedava_cache_{attr}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for family, s in sorted(self.families.items()):
+                lines.append(f'{name}{{family="{family}"}} {getattr(s, attr)}')
+
+        name = "bedava_cache_fetch_duration_seconds"
+        lines.append(f"# HELP {name} Upstream fetch duration per cache fill")
+        lines.append(f"# TYPE {name} histogram")
+        for family, s in sorted(self.families.items()):
+            cumulative = 0
+            for bound, count in zip(FETCH_DURATION_BUCKETS + ("+Inf",), s.fetch_buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{{family="{family}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{family="{family}"}} {s.fetch_seconds:.6f}')
+            lines.append(f'{name}_count{{family="{family}"}} {cumulative}')
+        return lines
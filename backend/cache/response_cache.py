@@ -0,0 +1,200 @@
+"""Rendered JSON response cache for hot API endpoints.
+
+Each rendering stores the encoded JSON body plus gzip and brotli variants,
+keyed by route and query string. It is reused for as long as every cache
+entry read while building it keeps the same version and stays fresh.
+Versions are local to one process, so the ETag sent on /api responses whose
+handler opts in (see cacheable()) is a hash of the body instead; it stays
+valid across restarts and worker processes. The versions still drive max-age.
+"""
+
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_COMPRESS_MIN_BYTES
+from backend.cache.memory_cache import MemoryCache, cache as default_cache
+
+try:
+    import brotli
+except ImportError:  # Optional: fall back to gzip only
+    brotli = None
+
+
+@dataclass
+class RenderedResponse:
+    versions: dict[str, int]
+    body: bytes
+    digest: str
+    gzip: bytes | None
+    br: bytes | None
+
+
+def render_json(data: Any) -> bytes:
+    """Encode like FastAPI's JSONResponse does."""
+    return json.dumps(
+        jsonable_encoder(data),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def body_digest(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()[:20]
+
+
+def _accepted_encodings(request: Request) -> set[str]:
+    header = request.headers.get("accept-encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+def cacheable(request: Request):
+    """Route dependency opting a handler into ETag/max-age validators.
+
+    Only for handlers whose body is fully determined by the cache entries
+    they read; anything else could get a matching ETag for a different body.
+    """
+    request.state.cacheable = True
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        cache: MemoryCache = default_cache,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+    ):
+        self._cache = cache
+        self._entries: OrderedDict[str, RenderedResponse] = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def _render(self, data: Any, versions: dict[str, int]) -> RenderedResponse:
+        body = render_json(data)
+        gz = br = None
+        if len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+            gz = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                br = brotli.compress(body, quality=5)
+        return RenderedResponse(
+            versions=dict(versions), body=body, digest=body_digest(body), gzip=gz, br=br
+        )
+
+    async def lookup(
+        self, request: Request, build: Callable[[], Awaitable[Any]]
+    ) -> RenderedResponse:
+        """Return the current rendering for this request, building it if needed."""
+        key = f"{request.url.path}?{request.url.query}"
+        rendered = self._entries.get(key)
+        if rendered is not None and self._cache.is_current(rendered.versions):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._cache.record_reads(rendered.versions)
+            return rendered
+
+        self.misses += 1
+        with self._cache.track() as versions:
+            data = await build()
+        rendered = self._render(data, versions)
+
+        # Only renderings backed by cache entries can be validated later
+        if versions:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+    async def serve(
+        self, request: Request, build: Callable[[], Awaitable[Any]]
+    ) -> Response:
+        """Serve build()'s JSON result, reusing the cached encoding if current."""
+        cacheable(request)
+        rendered = await self.lookup(request, build)
+        # Lets conditional_response() tag the response without re-reading it
+        request.state.body_digest = rendered.digest
+        headers = {"Vary": "Accept-Encoding"}
+        body = rendered.body
+        accepted = _accepted_encodings(request)
+        if rendered.br is not None and "br" in accepted:
+            body = rendered.br
+            headers["Content-Encoding"] = "br"
+        elif rendered.gzip is not None and "gzip" in accepted:
+            body = rendered.gzip
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def compute_etag(digest: str, encoding: str | None) -> str:
+    """Strong ETag for a response whose uncompressed body has this digest."""
+    # Each content-coding is a different representation with its own tag
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def conditional_response(
+    request: Request,
+    response: Response,
+    versions: dict[str, int],
+    cache: MemoryCache = default_cache,
+) -> Response:
+    """Add ETag/Cache-Control to a cache-backed response; answer If-None-Match with 304.
+
+    Responses of handlers that did not opt in via cacheable() pass through.
+    """
+    if (response.status_code != 200 or not versions
+            or not getattr(request.state, "cacheable", False)):
+        return response
+
+    digest = getattr(request.state, "body_digest", None)
+    if digest is None:
+        # Not rendered by ResponseCache: buffer the body to hash it
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        response = Response(
+            content=body, status_code=response.status_code,
+            headers=dict(response.headers), media_type=response.media_type,
+        )
+        digest = body_digest(body)
+
+    etag = compute_etag(digest, response.headers.get("content-encoding"))
+    max_age = int(cache.remaining_ttl(versions) or 0)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, s-maxage={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    for name, value in headers.items():
+        response.headers[name] = value
+    return response
+
+
+# Global response cache instance
+response_cache = ResponseCache()
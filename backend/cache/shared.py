@@ -0,0 +1,219 @@
+"""Leader election and a shared cache store for multi-worker deployments.
+
+With uvicorn --workers N every worker runs the lifespan hook. The worker
+holding an exclusive file lock becomes the leader: it runs the refresh jobs
+and publishes the cache into shared memory (/dev/shm), one file per key
+rewritten only when that entry changed. The others follow: they reload the
+files whose mtime moved since their last sync and serve from them without
+refreshing those entries themselves. If the leader dies its lock is
+released and the next follower to try takes over.
+
+A key a follower lacks (or holds past max staleness) is requested from the
+leader over a Unix socket instead of upstream. The leader answers from its
+cache, first replaying the follower's API request in-process (warm) if it
+does not hold a fresh copy either. Followers only fetch upstream themselves
+while no leader is reachable.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Coroutine
+
+from config import (
+    CACHE_SNAPSHOT_MAX_AGE,
+    CACHE_SHARED_LOCK_PATH,
+    CACHE_SHARED_SOCKET_PATH,
+    CACHE_SHARED_LEADER_TIMEOUT,
+    CACHE_SHARED_STORE_PATH,
+    CACHE_SHARED_PUBLISH_INTERVAL,
+    CACHE_SHARED_POLL_INTERVAL,
+)
+from backend.cache.memory_cache import MemoryCache, cache as default_cache
+from backend.cache.snapshot import encode_row, read_rows, write_lines
+
+_STORE_SUFFIX = ".json.gz"
+
+# Path and query of the API request being served; lets the leader replay it
+current_request_path: ContextVar[str | None] = ContextVar("current_request_path", default=None)
+
+
+class WorkerCoordinator:
+    def __init__(
+        self,
+        cache: MemoryCache = default_cache,
+        lock_path: str = CACHE_SHARED_LOCK_PATH,
+        store_path: str = CACHE_SHARED_STORE_PATH,
+        socket_path: str = CACHE_SHARED_SOCKET_PATH,
+        warm: Callable[[str], Awaitable[Any]] | None = None,
+    ):
+        self._cache = cache
+        self.lock_path = lock_path
+        self.store_path = store_path
+        self.socket_path = socket_path
+        self._warm = warm
+        self.is_leader = False
+        self._lock_fd: int | None = None
+        self._store_mtimes: dict[str, int] = {}
+        self._published_version = -1
+        self._published: dict[str, int | None] = {}
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _unlock(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.is_leader = False
+
+    def _store_file(self, key: str) -> Path:
+        name = hashlib.sha1(key.encode()).hexdigest()[:24]
+        return Path(self.store_path) / f"{name}{_STORE_SUFFIX}"
+
+    def _write_store(self, rows: list[tuple[Path, str]], stale: list[Path]):
+        for path, line in rows:
+            write_lines(path, [line], compresslevel=1)
+        for path in stale:
+            path.unlink(missing_ok=True)
+
+    async def _publish(self):
+        """Write the entries whose version changed and drop evicted keys."""
+        rows, live = [], set()
+        for key, entry in self._cache.entries():
+            path = self._store_file(key)
+            live.add(path.name)
+            if self._published.get(path.name) != entry.version:
+                self._published[path.name] = entry.version
+                line = encode_row(key, entry.fetched_at, entry.ttl, entry.data)
+                if line is not None:
+                    rows.append((path, line))
+        stale = [Path(self.store_path) / name for name in self._published.keys() - live]
+        for path in stale:
+            del self._published[path.name]
+        try:
+            await asyncio.to_thread(self._write_store, rows, stale)
+        except Exception:
+            for path, _ in rows:
+                self._published.pop(path.name, None)  # Retried on the next publish
+            raise
+
+    async def _publish_loop(self):
+        # Files left by a previous leader are rewritten or removed on the first pass
+        os.makedirs(self.store_path, exist_ok=True)
+        self._published = {
+            name: None for name in os.listdir(self.store_path) if name.endswith(_STORE_SUFFIX)
+        }
+        while True:
+            if self._cache.last_version != self._published_version:
+                version = self._cache.last_version
+                try:
+                    await self._publish()
+                    self._published_version = version
+                except Exception as e:
+                    print(f"[BedavaFinans] Shared cache publish error: {e}")
+            await asyncio.sleep(CACHE_SHARED_PUBLISH_INTERVAL)
+
+    async def _serve_miss(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Leader side: answer one follower's {key, path} with the cached entry."""
+        try:
+            request = json.loads(await reader.readline())
+            key, path = request["key"], request.get("path")
+            entry = self._cache.peek(key)
+            if (entry is None or entry.is_expired) and path and self._warm is not None:
+                try:
+                    await self._warm(path)
+                except Exception:
+                    pass  # Still answer with whatever the cache holds
+                entry = self._cache.peek(key)
+            row = None if entry is None else {"f": entry.fetched_at, "t": entry.ttl, "d": entry.data}
+            writer.write(json.dumps(row, separators=(",", ":")).encode() + b"\n")
+            await writer.drain()
+        except Exception as e:
+            print(f"[BedavaFinans] Shared cache miss handling error: {e}")
+        finally:
+            writer.close()
+
+    async def _ask_leader(self, key: str) -> bool:
+        """Follower side: fetch key through the leader and store its copy."""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(self.socket_path, limit=2**27), 1
+        )
+        try:
+            request = {"key": key, "path": current_request_path.get()}
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), CACHE_SHARED_LEADER_TIMEOUT)
+        finally:
+            writer.close()
+        row = json.loads(line)  # An empty line (leader gone) raises
+        held = self._cache.peek(key)
+        if row is None or (held is not None and row["f"] <= held.fetched_at):
+            return False  # Nothing newer; negative-cached like a failed fetch
+        self._cache.restore(key, row["d"], row["f"], row["t"], shared=True)
+        return True
+
+    async def _serve_leader(self, *leader_jobs: Callable[[], Coroutine[Any, Any, Any]]):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Left behind by a previous leader
+        server = await asyncio.start_unix_server(
+            self._serve_miss, path=self.socket_path, limit=2**20
+        )
+        async with server:
+            await asyncio.gather(self._publish_loop(), *(job() for job in leader_jobs))
+
+    def _read_store(self) -> list[tuple[str, float, float, object]]:
+        """Rows of the store files whose mtime changed since the last call."""
+        mtimes, changed = {}, []
+        try:
+            listing = list(os.scandir(self.store_path))
+        except OSError:
+            return []
+        for item in listing:
+            if not item.name.endswith(_STORE_SUFFIX):
+                continue  # In-flight .tmp files
+            try:
+                mtimes[item.name] = item.stat().st_mtime_ns
+            except OSError:
+                continue
+            if self._store_mtimes.get(item.name) != mtimes[item.name]:
+                changed.append(Path(item.path))
+        self._store_mtimes = mtimes
+        return [
+            row for path in changed
+            for row in read_rows(path, CACHE_SNAPSHOT_MAX_AGE, float("inf"))
+        ]
+
+    async def _sync(self):
+        """Reload the entries the leader published since the last sync."""
+        for key, fetched_at, ttl, data in await asyncio.to_thread(self._read_store):
+            self._cache.restore(key, data, fetched_at, ttl, shared=True)
+
+    async def run(self, *leader_jobs: Callable[[], Coroutine[Any, Any, Any]]):
+        """Follow the shared store until elected, then run leader_jobs forever."""
+        try:
+            while True:
+                if self._try_lock():
+                    self.is_leader = True
+                    self._cache.read_only = False
+                    self._cache.miss_handler = None
+                    print(f"[BedavaFinans] Worker {os.getpid()} is the refresh leader")
+                    await self._serve_leader(*leader_jobs)
+                self._cache.read_only = True
+                self._cache.miss_handler = self._ask_leader
+                await self._sync()
+                await asyncio.sleep(CACHE_SHARED_POLL_INTERVAL)
+        finally:
+            self._unlock()
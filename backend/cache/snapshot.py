@@ -0,0 +1,97 @@
+"""Disk snapshots of the cache so auto-stopped machines start warm.
+
+Snapshots are gzip-compressed JSON lines, one cache entry per line with its
+fetched_at/ttl metadata, most recently used first. The loader streams the
+file line by line and stops when its time budget runs out, so a large
+snapshot can never stall startup.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+
+from config import (
+    CACHE_SNAPSHOT_PATH,
+    CACHE_SNAPSHOT_MAX_AGE,
+    CACHE_SNAPSHOT_LOAD_BUDGET,
+)
+from backend.cache.memory_cache import MemoryCache, cache as default_cache
+
+
+def encode_row(key: str, fetched_at: float, ttl: float, data: object) -> str | None:
+    """One snapshot line, or None if data is not JSON-serializable.
+
+    Called on the event loop: the loop keeps mutating cached objects, so
+    encoding them from a worker thread could see them change mid-walk.
+    """
+    try:
+        return json.dumps({"k": key, "f": fetched_at, "t": ttl, "d": data}, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None  # Rebuilt on demand instead
+
+
+def write_lines(path: Path, lines: list[str], compresslevel: int) -> int:
+    """Atomically write encoded rows as a gzip JSONL file. Returns the rows written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=compresslevel) as f:
+        for line in lines:
+            f.write(line)
+            f.write("\n")
+    os.replace(tmp, path)
+    return len(lines)
+
+
+def read_rows(path: Path, max_age: float, budget: float) -> list[tuple[str, float, float, object]]:
+    """Rows of a gzip JSONL file, in file order, until budget seconds pass."""
+    rows = []
+    deadline = time.monotonic() + budget
+    now = time.time()
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if time.monotonic() > deadline:
+                    break
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                # Entries still within their own TTL are always kept
+                if now - row["f"] > max(max_age, row["t"]):
+                    continue
+                rows.append((row["k"], row["f"], row["t"], row["d"]))
+    except (OSError, EOFError):
+        pass  # Missing or truncated snapshot: keep whatever was read
+    return rows
+
+
+async def save_snapshot(
+    cache: MemoryCache = default_cache,
+    path: str = CACHE_SNAPSHOT_PATH,
+    compresslevel: int = 5,
+) -> int:
+    """Write all cache entries to disk. Returns the number of entries saved."""
+    lines = []
+    for key, e in cache.entries():
+        line = encode_row(key, e.fetched_at, e.ttl, e.data)
+        if line is not None:
+            lines.append(line)
+        await asyncio.sleep(0)  # Let requests in between large entries
+    return await asyncio.to_thread(write_lines, Path(path), lines, compresslevel)
+
+
+async def load_snapshot(
+    cache: MemoryCache = default_cache,
+    path: str = CACHE_SNAPSHOT_PATH,
+    max_age: float = CACHE_SNAPSHOT_MAX_AGE,
+    budget: float = CACHE_SNAPSHOT_LOAD_BUDGET,
+) -> int:
+    """Restore entries from disk as stale data. Returns the number restored."""
+    rows = await asyncio.to_thread(read_rows, Path(path), max_age, budget)
+    # Insert least recently used first so recency order survives the restart
+    for key, fetched_at, ttl, data in reversed(rows):
+        cache.restore(key, data, fetched_at, ttl)
+    return len(rows)
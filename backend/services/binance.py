@@ -1,92 +1,213 @@
 """Binance API client for klines, funding rates, and open interest."""
 
-import httpx
+import asyncio
+import bisect
 
 from config import (
     BINANCE_BASE_URL,
     BINANCE_FUTURES_URL,
-    BINANCE_SYMBOL_MAP,
+    BINANCE_FANOUT_CONCURRENCY,
+    KLINES_MAX_CANDLES,
+    KLINES_RESAMPLE,
     CACHE_TTL_OHLC,
     CACHE_TTL_DERIVATIVES,
 )
+from backend.analysis.resample import resample_candles
 from backend.cache.memory_cache import cache
+from backend.services.coin_registry import binance_symbol, has_futures
+from backend.services.http_client import upstream_get
+from backend.services.json_decode import decode_json
+from backend.services.quota import Priority, request_priority
 
-_client: httpx.AsyncClient | None = None
 
+def coingecko_id_to_binance(coin_id: str) -> str | None:
+    """Convert CoinGecko coin ID to Binance trading symbol."""
+    return binance_symbol(coin_id)
 
-def _get_client() -> httpx.AsyncClient:
-    global _client
-    if _client is None or _client.is_closed:
-        _client = httpx.AsyncClient(timeout=30.0)
-    return _client
 
+def merge_candles(series: list[dict], new: list[dict]) -> list[dict]:
+    """Merge candles (sorted by time) into a series without mutating it.
 
-def coingecko_id_to_binance(coin_id: str) -> str | None:
-    """Convert CoinGecko coin ID to Binance trading symbol."""
-    return BINANCE_SYMBOL_MAP.get(coin_id)
+    New candles replace stored ones with the same open time and fill in or
+    extend the rest; only the overlapping tail is re-sorted. Trims to
+    KLINES_MAX_CANDLES.
+    """
+    if not new:
+        return series
+    cut = len(series)
+    while cut and series[cut - 1]["time"] >= new[0]["time"]:
+        cut -= 1
+    if cut == len(series):
+        tail = new
+    else:
+        by_time = {c["time"]: c for c in series[cut:]}
+        by_time.update((c["time"], c) for c in new)
+        tail = [by_time[t] for t in sorted(by_time)]
+    return (series[:cut] + tail)[-KLINES_MAX_CANDLES:]
+
+
+async def _extend_klines(symbol: str, interval: str, series: list[dict]) -> list[dict] | None:
+    """Fetch candles from the series' last open time onward and merge them.
+
+    Returns None when the gap is wider than one page and a reload is needed.
+    """
+    new = await _request_klines(
+        symbol, interval,
+        startTime=series[-1]["time"] * 1000, limit=KLINES_MAX_CANDLES,
+    )
+    if len(new) >= KLINES_MAX_CANDLES:
+        return None
+    return merge_candles(series, new)
+
+
+async def _request_klines(symbol: str, interval: str, **params) -> list[dict]:
+    resp = await upstream_get(
+        "binance",
+        f"{BINANCE_BASE_URL}/klines",
+        params={"symbol": f"{symbol}USDT", "interval": interval, **params},
+        weight=2,
+    )
+    return [
+        {
+            "time": int(k[0] / 1000),
+            "open": float(k[1]),
+            "high": float(k[2]),
+            "low": float(k[3]),
+            "close": float(k[4]),
+            "volume": float(k[5]),
+        }
+        for k in await decode_json(resp)
+    ]
+
+
+async def _fetch_series(symbol: str, interval: str) -> list[dict] | None:
+    """Return the cached upstream kline series, refreshing it incrementally.
+
+    Only candles from the last stored open time onward are requested, which
+    replaces the still-forming last candle and appends the new ones.
+    """
+    key = f"binance_klines_{symbol}_{interval}"
+
+    async def _fetch():
+        series = cache.get_even_if_stale(key)
+        if series:
+            extended = await _extend_klines(symbol, interval, series)
+            if extended is not None:
+                return extended
+        return await _request_klines(symbol, interval, limit=KLINES_MAX_CANDLES)
+
+    return await cache.get_or_fetch(key, CACHE_TTL_OHLC, _fetch)
+
+
+def _derive_series(symbol: str, interval: str, base: list[dict]) -> list[dict]:
+    """Keep the cached resampled series for interval in step with its base.
+
+    Only buckets from the last derived one onward are re-aggregated.
+    """
+    key = f"binance_klines_{symbol}_{interval}"
+    derived = cache.get_even_if_stale(key)
+    if derived and derived[-1]["time"] >= base[0]["time"]:
+        start = bisect.bisect_left(base, derived[-1]["time"], key=lambda c: c["time"])
+        tail = resample_candles(base[start:], interval)
+        if not tail or (tail == derived[-len(tail):] and cache.get(key) is not None):
+            return derived
+        derived = merge_candles(derived, tail)
+    else:
+        derived = resample_candles(base, interval, drop_partial_first=True)
+    cache.set(key, derived, CACHE_TTL_OHLC)
+    return derived
 
 
 async def fetch_klines(
     symbol: str, interval: str = "4h", limit: int = 100
 ) -> list[dict] | None:
     """Fetch kline/candlestick data from Binance spot.
-    Returns list of {time, open, high, low, close, volume}.
+    Returns the latest `limit` (at most KLINES_MAX_CANDLES) candles as
+    list of {time, open, high, low, close, volume}.
+
+    Intervals in KLINES_RESAMPLE are aggregated locally from their base
+    interval's series instead of being fetched separately.
     """
+    base_interval = KLINES_RESAMPLE.get(interval)
+    if base_interval is None:
+        series = await _fetch_series(symbol, interval)
+    else:
+        base = await _fetch_series(symbol, base_interval)
+        series = _derive_series(symbol, interval, base) if base else base
+    return series[-limit:] if series else series
+
+
+async def backfill_klines(symbol: str, interval: str):
+    """Bring an already cached kline series up to date over REST."""
+    key = f"binance_klines_{symbol}_{interval}"
+    series = cache.get_even_if_stale(key)
+    if not series:
+        return
+    extended = await _extend_klines(symbol, interval, series)
+    if extended is None:
+        extended = await _request_klines(symbol, interval, limit=KLINES_MAX_CANDLES)
+    cache.set(key, extended, CACHE_TTL_OHLC)
+
+
+async def fetch_spot_prices() -> dict[str, float] | None:
+    """Fetch the last spot price of every pair, e.g. {"BTCUSDT": 65000.0}."""
 
     async def _fetch():
-        client = _get_client()
-        resp = await client.get(
-            f"{BINANCE_BASE_URL}/klines",
-            params={"symbol": f"{symbol}USDT", "interval": interval, "limit": limit},
-        )
-        resp.raise_for_status()
-        raw = resp.json()
-        return [
-            {
-                "time": int(k[0] / 1000),
-                "open": float(k[1]),
-                "high": float(k[2]),
-                "low": float(k[3]),
-                "close": float(k[4]),
-                "volume": float(k[5]),
-            }
-            for k in raw
-        ]
+        resp = await upstream_get("binance", f"{BINANCE_BASE_URL}/ticker/price", weight=4)
+        return {item["symbol"]: float(item["price"]) for item in await decode_json(resp)}
 
-    return await cache.get_or_fetch(
-        f"binance_klines_{symbol}_{interval}", CACHE_TTL_OHLC, _fetch
+    return await cache.get_or_fetch("spot_prices", CACHE_TTL_DERIVATIVES, _fetch)
+
+
+async def fetch_quote_volumes() -> dict[str, float]:
+    """Rolling 24h quote volume of every USDT spot pair, in one request.
+
+    Not cached: each call is a sample for the volume sampler.
+    """
+    resp = await upstream_get(
+        "binance", f"{BINANCE_BASE_URL}/ticker/24hr", params={"type": "MINI"}, weight=80
     )
+    return {
+        t["symbol"]: float(t["quoteVolume"])
+        for t in await decode_json(resp)
+        if t["symbol"].endswith("USDT")
+    }
 
 
-async def fetch_funding_rates(symbol: str | None = None) -> list[dict] | None:
-    """Fetch latest funding rates for futures. If no symbol, returns top coins."""
+async def fetch_premium_index() -> dict[str, dict] | None:
+    """Fetch funding rate and mark/index price for every perpetual in one call.
+
+    Returns {pair: {funding_rate, mark_price, index_price, next_funding_time}},
+    e.g. pair "BTCUSDT". Shared by derivatives, signals and arbitrage.
+    """
 
     async def _fetch():
-        client = _get_client()
-        params = {"limit": 30}
-        if symbol:
-            params["symbol"] = f"{symbol}USDT"
-        resp = await client.get(
-            f"{BINANCE_FUTURES_URL}/fapi/v1/fundingRate", params=params
+        resp = await upstream_get(
+            "binance_futures", f"{BINANCE_FUTURES_URL}/fapi/v1/premiumIndex", weight=10
         )
-        resp.raise_for_status()
-        return resp.json()
+        return {
+            p["symbol"]: {
+                "funding_rate": float(p.get("lastFundingRate") or 0),
+                "mark_price": float(p.get("markPrice") or 0),
+                "index_price": float(p.get("indexPrice") or 0),
+                "next_funding_time": p.get("nextFundingTime", 0),
+            }
+            for p in await decode_json(resp)
+        }
 
-    key = f"funding_{symbol or 'all'}"
-    return await cache.get_or_fetch(key, CACHE_TTL_DERIVATIVES, _fetch)
+    return await cache.get_or_fetch("premium_index", CACHE_TTL_DERIVATIVES, _fetch)
 
 
 async def fetch_open_interest(symbol: str) -> dict | None:
     """Fetch open interest for a futures symbol."""
 
     async def _fetch():
-        client = _get_client()
-        resp = await client.get(
+        resp = await upstream_get(
+            "binance_futures",
             f"{BINANCE_FUTURES_URL}/fapi/v1/openInterest",
             params={"symbol": f"{symbol}USDT"},
         )
-        resp.raise_for_status()
-        return resp.json()
+        return await decode_json(resp)
 
     return await cache.get_or_fetch(
         f"oi_{symbol}", CACHE_TTL_DERIVATIVES, _fetch
@@ -99,13 +220,12 @@ async def fetch_long_short_ratio(
     """Fetch global long/short account ratio."""
 
     async def _fetch():
-        client = _get_client()
-        resp = await client.get(
+        resp = await upstream_get(
+            "binance_futures",
             f"{BINANCE_FUTURES_URL}/futures/data/globalLongShortAccountRatio",
             params={"symbol": f"{symbol}USDT", "period": period, "limit": 10},
         )
-        resp.raise_for_status()
-        return resp.json()
+        return await decode_json(resp)
 
     return await cache.get_or_fetch(
         f"ls_ratio_{symbol}_{period}", CACHE_TTL_DERIVATIVES, _fetch
@@ -113,28 +233,49 @@ async def fetch_long_short_ratio(
 
 
 async def fetch_top_derivatives(coin_ids: list[str]) -> list[dict]:
-    """Fetch derivatives overview for a list of coins."""
-    results = []
-    for coin_id in coin_ids:
-        symbol = coingecko_id_to_binance(coin_id)
-        if not symbol:
-            continue
+    """Fetch derivatives overview for a list of coins.
+
+    Funding rates come from the bulk premium index; open interest and
+    long/short requests run concurrently (bounded by
+    BINANCE_FANOUT_CONCURRENCY) at bulk quota priority. A failed metric is
+    reported as None and results keep the order of coin_ids.
+    """
+    semaphore = asyncio.Semaphore(BINANCE_FANOUT_CONCURRENCY)
+
+    async def _limited(coro):
+        async with semaphore:
+            with request_priority(Priority.BULK):
+                return await coro
+
+    def _parse(parse_fn, raw):
+        if raw is None or isinstance(raw, BaseException):
+            return None
         try:
-            funding = await fetch_funding_rates(symbol)
-            oi = await fetch_open_interest(symbol)
-            ls = await fetch_long_short_ratio(symbol)
-
-            latest_funding = float(funding[-1]["fundingRate"]) if funding else None
-            oi_value = float(oi["openInterest"]) if oi else None
-            ls_ratio = float(ls[0]["longShortRatio"]) if ls else None
-
-            results.append({
-                "coin_id": coin_id,
-                "symbol": symbol,
-                "funding_rate": latest_funding,
-                "open_interest": oi_value,
-                "long_short_ratio": ls_ratio,
-            })
-        except Exception:
-            continue
-    return results
+            return parse_fn(raw)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+
+    async def _fetch_coin(coin_id: str, symbol: str) -> dict:
+        oi, ls = await asyncio.gather(
+            _limited(fetch_open_interest(symbol)),
+            _limited(fetch_long_short_ratio(symbol)),
+            return_exceptions=True,
+        )
+        return {
+            "coin_id": coin_id,
+            "symbol": symbol,
+            "funding_rate": _parse(lambda p: p[f"{symbol}USDT"]["funding_rate"], premium),
+            "open_interest": _parse(lambda o: float(o["openInterest"]), oi),
+            "long_short_ratio": _parse(lambda r: float(r[0]["longShortRatio"]), ls),
+        }
+
+    # Funding rates for every coin come from one bulk premium index snapshot
+    try:
+        premium = await fetch_premium_index()
+    except Exception:
+        premium = None
+
+    pairs = [(c, coingecko_id_to_binance(c)) for c in coin_ids if has_futures(c)]
+    return list(await asyncio.gather(*(
+        _fetch_coin(coin_id, symbol) for coin_id, symbol in pairs if symbol
+    )))
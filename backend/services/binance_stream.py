@@ -0,0 +1,244 @@
+"""Binance WebSocket ingestion that keeps cached Binance data live.
+
+Combined streams feed the same cache entries the REST readers use:
+@kline_<interval> updates binance_klines_* series, !markPrice@arr the
+premium index and !miniTicker@arr the spot price snapshot. Frames are
+buffered and written to the cache in batches every
+BINANCE_STREAM_FLUSH_INTERVAL seconds, which also keeps those entries fresh
+so readers never fall through to REST while the streams are healthy. The
+premium index and spot prices tick every second; they are only rewritten
+after a material move, at most every BINANCE_STREAM_SNAPSHOT_INTERVAL, so
+responses built from them keep hitting the response cache. After
+every (re)connect, cached kline series are backfilled over REST to close
+the gap.
+"""
+
+import asyncio
+import sys
+import time
+from typing import Callable
+
+from config import (
+    BINANCE_SYMBOL_MAP,
+    BINANCE_SPOT_WS_URL,
+    BINANCE_FUTURES_WS_URL,
+    BINANCE_STREAM_KLINE_INTERVALS,
+    BINANCE_STREAM_FLUSH_INTERVAL,
+    BINANCE_STREAM_SNAPSHOT_INTERVAL,
+    BINANCE_STREAM_MIN_CHANGE,
+    BINANCE_STREAM_MIN_FUNDING_CHANGE,
+    BINANCE_STREAM_MAX_BACKOFF,
+    CACHE_TTL_OHLC,
+    CACHE_TTL_DERIVATIVES,
+)
+from backend.cache.memory_cache import cache, estimate_size
+from backend.services.binance import merge_candles, backfill_klines
+from backend.services.json_decode import loads
+from backend.services.quota import Priority, request_priority
+
+try:
+    import websockets
+except ImportError:  # Optional: streaming mode is unavailable without it
+    websockets = None
+
+
+# Frames received since the last flush
+_pending_klines: dict[str, dict[int, dict]] = {}  # cache key -> {open time: candle}
+_pending_premium: dict[str, dict] = {}
+_pending_spot: dict[str, float] = {}
+# When the stream last rewrote each snapshot entry (cache key -> time)
+_snapshot_written: dict[str, float] = {}
+
+_stats = {"frames": 0, "flushes": 0, "reconnects": 0, "connected": set(), "last_frame": 0.0}
+
+
+def _handle_kline(k: dict):
+    key = f"binance_klines_{k['s'].removesuffix('USDT')}_{k['i']}"
+    candle = {
+        "time": int(k["t"] / 1000),
+        "open": float(k["o"]),
+        "high": float(k["h"]),
+        "low": float(k["l"]),
+        "close": float(k["c"]),
+        "volume": float(k["v"]),
+    }
+    _pending_klines.setdefault(key, {})[candle["time"]] = candle
+
+
+def _handle_mark_prices(items: list[dict]):
+    for p in items:
+        _pending_premium[p["s"]] = {
+            "funding_rate": float(p.get("r") or 0),
+            "mark_price": float(p.get("p") or 0),
+            "index_price": float(p.get("i") or 0),
+            "next_funding_time": p.get("T", 0),
+        }
+
+
+def _handle_mini_tickers(items: list[dict]):
+    for t in items:
+        _pending_spot[t["s"]] = float(t["c"])
+
+
+def handle_message(msg: dict):
+    """Buffer one combined-stream frame ({"stream": ..., "data": ...})."""
+    stream = msg.get("stream", "")
+    data = msg.get("data")
+    if data is None:
+        return
+    _stats["frames"] += 1
+    _stats["last_frame"] = time.time()
+    if "@kline_" in stream:
+        _handle_kline(data["k"])
+    elif stream.startswith("!markPrice@arr"):
+        _handle_mark_prices(data)
+    elif stream == "!miniTicker@arr":
+        _handle_mini_tickers(data)
+
+
+def _series_size(series: list[dict]) -> int:
+    # Candles all have the same shape; sizing one avoids walking the series
+    return sys.getsizeof(series) + len(series) * estimate_size(series[-1])
+
+
+def _moved(old: float | None, new: float) -> bool:
+    return old is None or abs(new - old) > BINANCE_STREAM_MIN_CHANGE * abs(old)
+
+
+def _premium_changed(current: dict) -> bool:
+    for symbol, p in _pending_premium.items():
+        old = current.get(symbol)
+        if (old is None or _moved(old["mark_price"], p["mark_price"])
+                or abs(p["funding_rate"] - old["funding_rate"]) >= BINANCE_STREAM_MIN_FUNDING_CHANGE):
+            return True
+    return False
+
+
+def _snapshot_due(key: str, changed: Callable[[], bool]) -> bool:
+    """Whether buffered updates should be written to a snapshot entry now.
+
+    Always before the entry would expire; otherwise only after a material
+    change and at most every BINANCE_STREAM_SNAPSHOT_INTERVAL seconds.
+    """
+    entry = cache.peek(key)
+    if entry is None or entry.age >= entry.ttl - BINANCE_STREAM_SNAPSHOT_INTERVAL:
+        return True
+    if time.time() - _snapshot_written.get(key, 0) < BINANCE_STREAM_SNAPSHOT_INTERVAL:
+        return False
+    return changed()
+
+
+def flush_pending():
+    """Write buffered frames into the cache."""
+    for key, candles in _pending_klines.items():
+        # Only series a REST fetch has seeded with history are kept live
+        series = cache.get_even_if_stale(key)
+        if series:
+            new = sorted(candles.values(), key=lambda c: c["time"])
+            merged = merge_candles(series, new)
+            cache.set(key, merged, CACHE_TTL_OHLC, size=_series_size(merged))
+    _pending_klines.clear()
+
+    # Updates not written yet stay buffered; later frames overwrite them
+    if _pending_premium:
+        # !markPrice@arr carries every perpetual, so it can seed the index too
+        current = cache.get_even_if_stale("premium_index") or {}
+        if _snapshot_due("premium_index", lambda: _premium_changed(current)):
+            cache.set("premium_index", {**current, **_pending_premium}, CACHE_TTL_DERIVATIVES)
+            _snapshot_written["premium_index"] = time.time()
+            _pending_premium.clear()
+
+    if _pending_spot:
+        # !miniTicker@arr only carries pairs that changed; needs a REST base
+        current = cache.get_even_if_stale("spot_prices")
+        if current is None:
+            _pending_spot.clear()
+        elif _snapshot_due("spot_prices", lambda: any(
+            _moved(current.get(s), price) for s, price in _pending_spot.items()
+        )):
+            cache.set("spot_prices", {**current, **_pending_spot}, CACHE_TTL_DERIVATIVES)
+            _snapshot_written["spot_prices"] = time.time()
+            _pending_spot.clear()
+    _stats["flushes"] += 1
+
+
+def _spot_streams() -> list[str]:
+    symbols = sorted(set(BINANCE_SYMBOL_MAP.values()))
+    return [
+        f"{s.lower()}usdt@kline_{interval}"
+        for s in symbols
+        for interval in BINANCE_STREAM_KLINE_INTERVALS
+    ] + ["!miniTicker@arr"]
+
+
+async def _backfill_klines():
+    """Close the gap left by a disconnect in every cached kline series."""
+    with request_priority(Priority.BACKGROUND):
+        for symbol in sorted(set(BINANCE_SYMBOL_MAP.values())):
+            for interval in BINANCE_STREAM_KLINE_INTERVALS:
+                try:
+                    await backfill_klines(symbol, interval)
+                except Exception as e:
+                    print(f"[BedavaFinans] Kline backfill error ({symbol} {interval}): {e}")
+
+
+async def consume_stream(name: str, url: str, streams: list[str], on_connect=None):
+    """Keep a combined stream connected, reconnecting with backoff."""
+    backoff = 1
+    while True:
+        backfill = None
+        try:
+            async with websockets.connect(
+                f"{url}?streams={'/'.join(streams)}", max_size=2**23
+            ) as ws:
+                _stats["connected"].add(name)
+                backoff = 1
+                # Runs alongside the stream; the reference keeps it alive
+                backfill = asyncio.create_task(on_connect()) if on_connect else None
+                async for raw in ws:
+                    try:
+                        handle_message(loads(raw))
+                    except (KeyError, TypeError, ValueError):
+                        continue  # Malformed frame
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[BedavaFinans] Binance stream '{name}' error: {e}")
+        finally:
+            _stats["connected"].discard(name)
+            if backfill is not None:
+                backfill.cancel()
+        _stats["reconnects"] += 1
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, BINANCE_STREAM_MAX_BACKOFF)
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(BINANCE_STREAM_FLUSH_INTERVAL)
+        flush_pending()
+
+
+async def run_binance_streams(
+    spot_url: str = BINANCE_SPOT_WS_URL,
+    futures_url: str = BINANCE_FUTURES_WS_URL,
+):
+    """Run the spot and futures streams plus the cache flusher until cancelled."""
+    if websockets is None:
+        print("[BedavaFinans] websockets is not installed; Binance streaming disabled")
+        return
+    await asyncio.gather(
+        consume_stream("spot", spot_url, _spot_streams(), on_connect=_backfill_klines),
+        consume_stream("futures", futures_url, ["!markPrice@arr@1s"]),
+        _flush_loop(),
+    )
+
+
+def stream_stats() -> dict:
+    return {
+        "connected": sorted(_stats["connected"]),
+        "frames": _stats["frames"],
+        "flushes": _stats["flushes"],
+        "reconnects": _stats["reconnects"],
+        "last_frame_age": round(time.time() - _stats["last_frame"], 1) if _stats["last_frame"] else None,
+    }
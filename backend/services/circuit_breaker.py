@@ -0,0 +1,94 @@
+"""Per-upstream circuit breakers so a failing API is not hammered."""
+
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+
+# Statuses that mean the upstream is unhealthy or rate limiting us (418 = Binance IP ban)
+TRIP_STATUS_CODES = {418, 429}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed → open after N consecutive failures → half-open single probe."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.time()
+
+    @asynccontextmanager
+    async def guard(self):
+        """Wrap one upstream request; raises CircuitOpenError while open."""
+        state = self.state
+        probe = False
+        if state == "open" or (state == "half_open" and self._probing):
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        if state == "half_open":
+            self._probing = probe = True
+
+        try:
+            yield self
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status in TRIP_STATUS_CODES or status >= 500:
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except httpx.TransportError:
+            self.record_failure()
+            raise
+        else:
+            self.record_success()
+        finally:
+            if probe:
+                self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Return the shared breaker for an upstream, creating it on first use."""
+    if upstream not in _breakers:
+        _breakers[upstream] = CircuitBreaker(upstream)
+    return _breakers[upstream]
+
+
+def breaker_stats() -> dict:
+    return {name: b.stats() for name, b in _breakers.items()}
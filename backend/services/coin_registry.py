@@ -0,0 +1,170 @@
+"""Coin universe registry joining CoinGecko coins with Binance USDT pairs.
+
+Built from CoinGecko's coin list, its market-cap ranking and stablecoin /
+pegged-asset categories, plus Binance spot and futures exchangeInfo. The
+registry is cached for a day under "coin_registry" (so it is snapshotted and
+shared with follower workers like any other entry); lookups go through
+sets and dicts derived from the cached copy and never call an upstream.
+Until it is first built, lookups fall back to BINANCE_SYMBOL_MAP and the
+COIN_REGISTRY_FALLBACK_* sets.
+"""
+
+import asyncio
+import time
+
+from config import (
+    BINANCE_BASE_URL,
+    BINANCE_FUTURES_URL,
+    BINANCE_SYMBOL_MAP,
+    CACHE_TTL_COIN_REGISTRY,
+    COIN_REGISTRY_RANKED,
+    COIN_REGISTRY_STABLE_CATEGORY,
+    COIN_REGISTRY_PEGGED_CATEGORIES,
+    COIN_REGISTRY_FALLBACK_STABLECOINS,
+    COIN_REGISTRY_FALLBACK_PEGGED,
+)
+from backend.cache.memory_cache import cache
+from backend.services.coingecko import fetch_coin_list, fetch_ranked_coins
+from backend.services.http_client import upstream_get
+from backend.services.json_decode import decode_json
+
+
+async def _fetch_usdt_bases(futures: bool) -> set[str]:
+    """Base assets of every trading USDT pair (perpetuals for futures)."""
+    if futures:
+        resp = await upstream_get("binance_futures", f"{BINANCE_FUTURES_URL}/fapi/v1/exchangeInfo")
+    else:
+        resp = await upstream_get(
+            "binance", f"{BINANCE_BASE_URL}/exchangeInfo",
+            params={"symbolStatus": "TRADING"}, weight=20,
+        )
+    return {
+        s["baseAsset"]
+        for s in (await decode_json(resp))["symbols"]
+        if s["quoteAsset"] == "USDT" and s["status"] == "TRADING"
+        and (not futures or s.get("contractType") == "PERPETUAL")
+    }
+
+
+async def _category_ids(category: str) -> list[str]:
+    return [c["id"] for c in await fetch_ranked_coins(250, category=category)]
+
+
+async def _build_registry() -> dict:
+    coin_list, ranked, spot, futures, stable, *pegged = await asyncio.gather(
+        fetch_coin_list(),
+        fetch_ranked_coins(COIN_REGISTRY_RANKED),
+        _fetch_usdt_bases(futures=False),
+        _fetch_usdt_bases(futures=True),
+        _category_ids(COIN_REGISTRY_STABLE_CATEGORY),
+        *(_category_ids(c) for c in COIN_REGISTRY_PEGGED_CATEGORIES),
+    )
+
+    # Overrides first, then each symbol goes to its best ranked coin
+    symbols = dict(BINANCE_SYMBOL_MAP)
+    claimed = set(symbols.values())
+    for coin in ranked:
+        symbol = coin["symbol"].upper()
+        if symbol in spot and symbol not in claimed and coin["id"] not in symbols:
+            symbols[coin["id"]] = symbol
+            claimed.add(symbol)
+
+    return {
+        "ids": [c["id"] for c in coin_list],
+        "binance": symbols,
+        "futures": [coin_id for coin_id, symbol in symbols.items() if symbol in futures],
+        "stablecoins": stable,
+        "pegged": sorted({coin_id for ids in pegged for coin_id in ids} | set(stable)),
+        "built_at": int(time.time()),
+    }
+
+
+async def fetch_coin_registry() -> dict | None:
+    """Build the registry once a day (called by the leader's refresh loop)."""
+    return await cache.get_or_fetch("coin_registry", CACHE_TTL_COIN_REGISTRY, _build_registry)
+
+
+class _Index:
+    """O(1) lookup structures derived from one cached registry."""
+
+    def __init__(self, registry: dict):
+        self.source = registry
+        self.ids = frozenset(registry["ids"])
+        self.binance = registry["binance"]
+        self.by_symbol = {symbol: coin_id for coin_id, symbol in self.binance.items()}
+        self.futures = frozenset(registry["futures"])
+        self.stablecoins = frozenset(registry["stablecoins"])
+        self.pegged = frozenset(registry["pegged"])
+
+
+_index: _Index | None = None
+
+
+def _current() -> _Index | None:
+    """Index of the cached registry, rebuilt when a newer copy is stored."""
+    global _index
+    registry = cache.get_even_if_stale("coin_registry")
+    if registry is None:
+        return None
+    if _index is None or _index.source is not registry:
+        _index = _Index(registry)
+    return _index
+
+
+def is_known(coin_id: str) -> bool:
+    """Whether CoinGecko lists this id (assumed so until the registry exists)."""
+    index = _current()
+    return index is None or coin_id in index.ids
+
+
+def binance_symbol(coin_id: str) -> str | None:
+    """Binance base asset of a coin's USDT spot pair, e.g. "BTC"."""
+    index = _current()
+    if index is None:
+        return BINANCE_SYMBOL_MAP.get(coin_id)
+    return index.binance.get(coin_id)
+
+
+def coin_id_for_symbol(symbol: str) -> str | None:
+    """CoinGecko id behind a Binance base asset."""
+    index = _current()
+    if index is None:
+        return next((c for c, s in BINANCE_SYMBOL_MAP.items() if s == symbol.upper()), None)
+    return index.by_symbol.get(symbol.upper())
+
+
+def has_futures(coin_id: str) -> bool:
+    """Whether the coin has a USDT perpetual on Binance Futures."""
+    index = _current()
+    if index is None:
+        return coin_id in BINANCE_SYMBOL_MAP
+    return coin_id in index.futures
+
+
+def is_stablecoin(coin_id: str) -> bool:
+    index = _current()
+    if index is None:
+        return coin_id in COIN_REGISTRY_FALLBACK_STABLECOINS
+    return coin_id in index.stablecoins
+
+
+def is_pegged(coin_id: str) -> bool:
+    """Stablecoins and wrapped, staked or gold-backed tokens."""
+    index = _current()
+    if index is None:
+        return coin_id in COIN_REGISTRY_FALLBACK_PEGGED
+    return coin_id in index.pegged
+
+
+def registry_stats() -> dict:
+    index = _current()
+    if index is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "coins": len(index.ids),
+        "binance": len(index.binance),
+        "futures": len(index.futures),
+        "stablecoins": len(index.stablecoins),
+        "built_at": index.source.get("built_at"),
+    }
@@ -1,50 +1,68 @@
 """CoinGecko API client for market data, OHLC, and global stats."""
 
-import httpx
+import asyncio
+import math
 
-from config import COINGECKO_BASE_URL, TOP_N_COINS, CACHE_TTL_MARKET_DATA, CACHE_TTL_OHLC, CACHE_TTL_GLOBAL, SOLANA_ECOSYSTEM_COUNT, CACHE_TTL_SOLANA
+from config import COINGECKO_BASE_URL, COINGECKO_MARKETS_PAGE_SIZE, TOP_N_COINS, CACHE_TTL_MARKET_DATA, CACHE_TTL_OHLC, CACHE_TTL_GLOBAL, SOLANA_ECOSYSTEM_COUNT, CACHE_TTL_SOLANA
 from backend.cache.memory_cache import cache
+from backend.services.http_client import upstream_get
+from backend.services.json_decode import decode_json
 
-_client: httpx.AsyncClient | None = None
+# Largest list size requested so far per market list (cache key prefix)
+_market_list_sizes: dict[str, int] = {}
 
 
-def _get_client() -> httpx.AsyncClient:
-    global _client
-    if _client is None or _client.is_closed:
-        _client = httpx.AsyncClient(timeout=30.0)
-    return _client
+async def _fetch_market_pages(n: int, **params) -> list[dict]:
+    """Fetch the top n of /coins/markets, requesting all pages concurrently."""
+    per_page = min(n, COINGECKO_MARKETS_PAGE_SIZE)
 
-
-async def fetch_top_coins(n: int = TOP_N_COINS) -> list[dict] | None:
-    """Fetch top N coins by market cap with price changes."""
-
-    async def _fetch():
-        client = _get_client()
-        resp = await client.get(
+    async def _page(page: int) -> list[dict]:
+        resp = await upstream_get(
+            "coingecko",
             f"{COINGECKO_BASE_URL}/coins/markets",
             params={
                 "vs_currency": "usd",
                 "order": "market_cap_desc",
-                "per_page": n,
-                "page": 1,
+                "per_page": per_page,
+                "page": page,
                 "sparkline": "true",
                 "price_change_percentage": "1h,24h,7d",
+                **params,
             },
         )
-        resp.raise_for_status()
-        return resp.json()
+        return await decode_json(resp)
+
+    pages = await asyncio.gather(*(_page(p) for p in range(1, math.ceil(n / per_page) + 1)))
+    return [coin for page in pages for coin in page][:n]
+
+
+async def _fetch_market_list(key_prefix: str, n: int, ttl: float, **params) -> list[dict] | None:
+    """Serve the top n of a market list by slicing one cached superset.
+
+    The cached list always covers the largest n requested so far, so smaller
+    requests never trigger their own upstream call.
+    """
+    size = max(n, _market_list_sizes.get(key_prefix, 0))
+    _market_list_sizes[key_prefix] = size
+
+    async def _fetch():
+        return await _fetch_market_pages(size, **params)
+
+    coins = await cache.get_or_fetch(f"{key_prefix}{size}", ttl, _fetch)
+    return coins[:n] if coins is not None else None
+
 
-    return await cache.get_or_fetch(f"markets_top{n}", CACHE_TTL_MARKET_DATA, _fetch)
+async def fetch_top_coins(n: int = TOP_N_COINS) -> list[dict] | None:
+    """Fetch top N coins by market cap with price changes."""
+    return await _fetch_market_list("markets_top", n, CACHE_TTL_MARKET_DATA)
 
 
 async def fetch_global() -> dict | None:
     """Fetch global market data (total market cap, BTC dominance, etc.)."""
 
     async def _fetch():
-        client = _get_client()
-        resp = await client.get(f"{COINGECKO_BASE_URL}/global")
-        resp.raise_for_status()
-        data = resp.json()
+        resp = await upstream_get("coingecko", f"{COINGECKO_BASE_URL}/global")
+        data = await decode_json(resp)
         return data.get("data", {})
 
     return await cache.get_or_fetch("global_data", CACHE_TTL_GLOBAL, _fetch)
@@ -54,50 +72,43 @@ async def fetch_ohlc(coin_id: str, days: int = 14) -> list[list] | None:
     """Fetch OHLC data for a specific coin. Returns [[timestamp, O, H, L, C], ...]."""
 
     async def _fetch():
-        client = _get_client()
-        resp = await client.get(
+        resp = await upstream_get(
+            "coingecko",
             f"{COINGECKO_BASE_URL}/coins/{coin_id}/ohlc",
             params={"vs_currency": "usd", "days": days},
         )
-        resp.raise_for_status()
-        return resp.json()
+        return await decode_json(resp)
 
     return await cache.get_or_fetch(f"ohlc_{coin_id}_{days}", CACHE_TTL_OHLC, _fetch)
 
 
 async def fetch_solana_coins(n: int = SOLANA_ECOSYSTEM_COUNT) -> list[dict] | None:
     """Fetch top N Solana ecosystem coins by market cap."""
+    return await _fetch_market_list(
+        "solana_ecosystem_", n, CACHE_TTL_SOLANA, category="solana-ecosystem"
+    )
+
+
+async def fetch_coin_list() -> list[dict]:
+    """Fetch every listed coin as {id, symbol, name} (uncached, large)."""
+    resp = await upstream_get("coingecko", f"{COINGECKO_BASE_URL}/coins/list")
+    return await decode_json(resp)
 
-    async def _fetch():
-        client = _get_client()
-        resp = await client.get(
-            f"{COINGECKO_BASE_URL}/coins/markets",
-            params={
-                "vs_currency": "usd",
-                "category": "solana-ecosystem",
-                "order": "market_cap_desc",
-                "per_page": n,
-                "page": 1,
-                "sparkline": "true",
-                "price_change_percentage": "1h,24h,7d",
-            },
-        )
-        resp.raise_for_status()
-        return resp.json()
 
-    return await cache.get_or_fetch(f"solana_ecosystem_{n}", CACHE_TTL_SOLANA, _fetch)
+async def fetch_ranked_coins(n: int, **params) -> list[dict]:
+    """Fetch the top n of /coins/markets without sparklines (uncached)."""
+    return await _fetch_market_pages(n, sparkline="false", **params)
 
 
 async def fetch_coin_detail(coin_id: str) -> dict | None:
     """Fetch detailed coin info including description and links."""
 
     async def _fetch():
-        client = _get_client()
-        resp = await client.get(
+        resp = await upstream_get(
+            "coingecko",
             f"{COINGECKO_BASE_URL}/coins/{coin_id}",
             params={"localization": "false", "tickers": "false", "community_data": "false", "developer_data": "false"},
         )
-        resp.raise_for_status()
-        return resp.json()
+        return await decode_json(resp)
 
     return await cache.get_or_fetch(f"detail_{coin_id}", CACHE_TTL_OHLC, _fetch)
@@ -1,49 +1,97 @@
-"""Alternative.me Fear & Greed Index client."""
+"""Alternative.me Fear & Greed Index client.
 
-import httpx
+The full daily history is fetched once and kept as one time-sorted archive
+of parallel columns (cache key "fear_greed_archive"). Each refresh only
+requests the days added since the last point; every limit or date range is
+answered by slicing the archive.
+"""
+
+import bisect
+import time
 
 from config import ALTERNATIVE_ME_URL, CACHE_TTL_FEAR_GREED
 from backend.cache.memory_cache import cache
+from backend.services.http_client import upstream_get
+from backend.services.json_decode import decode_json
+
+
+async def _request_entries(limit: int) -> list[dict]:
+    """Latest `limit` daily entries, newest first (0 = the whole history)."""
+    resp = await upstream_get(
+        "alternative_me", ALTERNATIVE_ME_URL, params={"limit": limit, "format": "json"}
+    )
+    return (await decode_json(resp)).get("data") or []
 
-_client: httpx.AsyncClient | None = None
 
+def _merge(archive: dict | None, entries: list[dict]) -> dict:
+    """Return a copy of the archive with entries added or replaced by timestamp."""
+    if archive is None:
+        archive = {"time": [], "value": [], "class": [], "labels": []}
+    times, values = list(archive["time"]), list(archive["value"])
+    classes, labels = list(archive["class"]), list(archive["labels"])
 
-def _get_client() -> httpx.AsyncClient:
-    global _client
-    if _client is None or _client.is_closed:
-        _client = httpx.AsyncClient(timeout=30.0)
-    return _client
+    for e in sorted(entries, key=lambda e: int(e["timestamp"])):
+        ts = int(e["timestamp"])
+        label = e["value_classification"]
+        if label not in labels:
+            labels.append(label)
+        i = bisect.bisect_left(times, ts)
+        if i < len(times) and times[i] == ts:
+            values[i], classes[i] = int(e["value"]), labels.index(label)
+        else:
+            times.insert(i, ts)
+            values.insert(i, int(e["value"]))
+            classes.insert(i, labels.index(label))
+    return {"time": times, "value": values, "class": classes, "labels": labels}
 
 
-async def fetch_fear_greed(limit: int = 30) -> dict | None:
+async def fetch_fear_greed_archive() -> dict | None:
+    """Fetch the full history once, then extend it with new days only."""
+
+    async def _fetch():
+        archive = cache.get_even_if_stale("fear_greed_archive")
+        if not archive or not archive["time"]:
+            entries = await _request_entries(0)
+            return _merge(None, entries) if entries else None
+        # Days added since the last point plus that day, whose value may be
+        # revised; never 0, which would request the whole history
+        days = max(1, int(time.time() - archive["time"][-1]) // 86400 + 1)
+        return _merge(archive, await _request_entries(days))
+
+    archive = await cache.get_or_fetch("fear_greed_archive", CACHE_TTL_FEAR_GREED, _fetch)
+    return archive if archive and archive["time"] else None
+
+
+async def fetch_fear_greed(
+    limit: int = 30, start: int | None = None, end: int | None = None
+) -> dict | None:
     """Fetch Fear & Greed index with history.
     Returns {current: {value, classification}, history: [{value, classification, timestamp}, ...]}.
+
+    History holds the latest `limit` days (0 = all) between the optional
+    start and end Unix timestamps, newest first.
     """
+    archive = await fetch_fear_greed_archive()
+    if archive is None:
+        return None
 
-    async def _fetch():
-        client = _get_client()
-        resp = await client.get(
-            ALTERNATIVE_ME_URL, params={"limit": limit, "format": "json"}
-        )
-        resp.raise_for_status()
-        raw = resp.json()
-        entries = raw.get("data", [])
-        if not entries:
-            return None
-
-        current = entries[0]
-        return {
-            "value": int(current["value"]),
-            "classification": current["value_classification"],
-            "timestamp": current["timestamp"],
-            "history": [
-                {
-                    "value": int(e["value"]),
-                    "classification": e["value_classification"],
-                    "timestamp": e["timestamp"],
-                }
-                for e in entries
-            ],
-        }
-
-    return await cache.get_or_fetch("fear_greed", CACHE_TTL_FEAR_GREED, _fetch)
+    times, values = archive["time"], archive["value"]
+    classes, labels = archive["class"], archive["labels"]
+    lo = bisect.bisect_left(times, start) if start is not None else 0
+    hi = bisect.bisect_right(times, end) if end is not None else len(times)
+    if limit > 0:
+        lo = max(lo, hi - limit)
+
+    return {
+        "value": values[-1],
+        "classification": labels[classes[-1]],
+        "timestamp": str(times[-1]),
+        "history": [
+            {
+                "value": values[i],
+                "classification": labels[classes[i]],
+                "timestamp": str(times[i]),
+            }
+            for i in range(hi - 1, lo - 1, -1)
+        ],
+    }
@@ -1,56 +1,57 @@
 """Funding rate arbitrage service using Binance Futures API."""
 
-import httpx
-
-from config import BINANCE_BASE_URL, BINANCE_FUTURES_URL, CACHE_TTL_ARBITRAGE
+import asyncio
+
+from config import (
+    BINANCE_FANOUT_CONCURRENCY,
+    BINANCE_STREAM_ENABLED,
+    CACHE_TTL_ARBITRAGE,
+    CACHE_TTL_ARBITRAGE_STREAMING,
+    ARBITRAGE_OI_WEIGHT_BUDGET,
+)
 from backend.cache.memory_cache import cache
+from backend.services.quota import Priority, request_priority
+from backend.services.binance import fetch_premium_index, fetch_spot_prices, fetch_open_interest
 
-_client: httpx.AsyncClient | None = None
-
+# Binance request weight of one /fapi/v1/openInterest call
+_OPEN_INTEREST_WEIGHT = 1
 
-def _get_client() -> httpx.AsyncClient:
-    global _client
-    if _client is None or _client.is_closed:
-        _client = httpx.AsyncClient(timeout=30.0)
-    return _client
+# With streaming, the premium index and spot prices are live in the cache, so
+# rebuilding the table is local work; open interest keeps its own TTL
+_ARBITRAGE_TTL = CACHE_TTL_ARBITRAGE_STREAMING if BINANCE_STREAM_ENABLED else CACHE_TTL_ARBITRAGE
 
 
 async def fetch_arbitrage_data() -> list[dict] | None:
     """Fetch funding rate arbitrage opportunities from Binance.
 
-    Uses premiumIndex for funding rates + mark prices,
-    spot ticker for spot prices, and openInterest for OI data.
+    Uses the shared premiumIndex snapshot for funding rates + mark prices,
+    the shared spot price snapshot, and openInterest for OI data.
     Returns sorted by absolute APR descending.
     """
 
     async def _fetch():
-        client = _get_client()
-
-        # 1) Get all futures premium index data (funding rates + mark/index prices)
-        resp = await client.get(f"{BINANCE_FUTURES_URL}/fapi/v1/premiumIndex")
-        resp.raise_for_status()
-        premium_data = resp.json()
+        # 1) Funding rates + mark/index prices from the shared premium index snapshot
+        premium_index = await fetch_premium_index()
+        if not premium_index:
+            raise RuntimeError("premium index unavailable")
 
         # 2) Get all spot prices
-        resp2 = await client.get(f"{BINANCE_BASE_URL}/ticker/price")
-        resp2.raise_for_status()
-        spot_prices = {item["symbol"]: float(item["price"]) for item in resp2.json()}
+        spot_prices = await fetch_spot_prices() or {}
 
         # Filter to USDT perpetual pairs only
         usdt_perps = [
-            p for p in premium_data
-            if p["symbol"].endswith("USDT") and "DEFI" not in p["symbol"]
+            (symbol, p) for symbol, p in premium_index.items()
+            if symbol.endswith("USDT") and "DEFI" not in symbol
         ]
 
         results = []
-        for p in usdt_perps:
-            symbol = p["symbol"]  # e.g. "BTCUSDT"
-            base = symbol.replace("USDT", "")
+        for symbol, p in usdt_perps:
+            base = symbol.replace("USDT", "")  # e.g. "BTCUSDT" -> "BTC"
 
-            funding_rate = float(p.get("lastFundingRate", 0))
-            mark_price = float(p.get("markPrice", 0))
-            index_price = float(p.get("indexPrice", 0))
-            next_funding = p.get("nextFundingTime", 0)
+            funding_rate = p["funding_rate"]
+            mark_price = p["mark_price"]
+            index_price = p["index_price"]
+            next_funding = p["next_funding_time"]
 
             if mark_price == 0:
                 continue
@@ -80,33 +81,61 @@ async def fetch_arbitrage_data() -> list[dict] | None:
         results.sort(key=lambda x: abs(x["apr"]), reverse=True)
         top_results = results[:50]
 
-        # Batch fetch OI for top 50
-        for item in top_results:
-            try:
-                oi_resp = await client.get(
-                    f"{BINANCE_FUTURES_URL}/fapi/v1/openInterest",
-                    params={"symbol": item["pair"]},
-                )
-                if oi_resp.status_code == 200:
-                    oi_data = oi_resp.json()
-                    oi_value = float(oi_data.get("openInterest", 0))
-                    item["open_interest"] = oi_value
-                    item["open_interest_usd"] = round(oi_value * item["mark_price"], 0)
-                else:
-                    item["open_interest"] = None
-                    item["open_interest_usd"] = None
-            except Exception:
-                item["open_interest"] = None
-                item["open_interest_usd"] = None
+        await _enrich_open_interest(top_results)
 
         return top_results
 
     try:
-        return await cache.get_or_fetch("arbitrage_data", CACHE_TTL_ARBITRAGE, _fetch)
+        return await cache.get_or_fetch("arbitrage_data", _ARBITRAGE_TTL, _fetch)
     except Exception:
         return _get_fallback_data()
 
 
+async def _enrich_open_interest(items: list[dict]):
+    """Attach open interest to each item, concurrently and within a weight budget.
+
+    Reuses the oi_{symbol} cache entries of fetch_open_interest. Pairs without
+    a fresh entry are fetched until ARBITRAGE_OI_WEIGHT_BUDGET is spent; the
+    rest fall back to a stale entry or None.
+    """
+    semaphore = asyncio.Semaphore(BINANCE_FANOUT_CONCURRENCY)
+    budget = ARBITRAGE_OI_WEIGHT_BUDGET
+
+    async def _fetch(base: str):
+        async with semaphore:
+            with request_priority(Priority.BULK):
+                return await fetch_open_interest(base)
+
+    to_fetch = []
+    # Per item: cached OI payload, or the index of its request in to_fetch
+    oi_by_item: list[dict | int | None] = []
+    for item in items:
+        base = item["symbol"]
+        cached = cache.get(f"oi_{base}")
+        if cached is not None:
+            oi_by_item.append(cached)
+        elif budget >= _OPEN_INTEREST_WEIGHT:
+            budget -= _OPEN_INTEREST_WEIGHT
+            oi_by_item.append(len(to_fetch))
+            to_fetch.append(_fetch(base))
+        else:
+            oi_by_item.append(cache.get_even_if_stale(f"oi_{base}"))
+
+    fetched = await asyncio.gather(*to_fetch, return_exceptions=True)
+
+    for item, oi in zip(items, oi_by_item):
+        if isinstance(oi, int):
+            oi = fetched[oi]
+        try:
+            oi_value = float(oi["openInterest"])
+        except (KeyError, TypeError, ValueError):
+            item["open_interest"] = None
+            item["open_interest_usd"] = None
+            continue
+        item["open_interest"] = oi_value
+        item["open_interest_usd"] = round(oi_value * item["mark_price"], 0)
+
+
 def _get_fallback_data() -> list[dict]:
     """Fallback when API is unavailable."""
     return []
@@ -0,0 +1,260 @@
+"""Shared httpx clients, one tuned connection pool per upstream API.
+
+Service modules send requests through upstream_get() (or upstream_stream()
+for large bodies), which apply the upstream's circuit breaker and request
+quota around the pooled client. upstream_get() also retries transient
+failures with jittered backoff and can hedge slow requests (UPSTREAM_RETRY).
+"""
+
+import asyncio
+import importlib.util
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import httpx
+
+from config import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_WRITE_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    UPSTREAM_HTTP,
+    UPSTREAM_RETRY_DEFAULT,
+    UPSTREAM_RETRY,
+    HEDGE_MIN_SAMPLES,
+)
+from backend.services.circuit_breaker import get_breaker
+from backend.services.quota import get_quota
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client(upstream: str) -> httpx.AsyncClient:
+    cfg = UPSTREAM_HTTP.get(upstream, {})
+    max_connections = cfg.get("max_connections", 4)
+    return httpx.AsyncClient(
+        http2=_HTTP2_AVAILABLE and cfg.get("http2", False),
+        timeout=httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_WRITE_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT,
+        ),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    """Return the shared client for an upstream (see UPSTREAM_HTTP)."""
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _clients[upstream] = _build_client(upstream)
+    return client
+
+
+class _RequestStats:
+    """Recent latencies and retry/hedge counters of one upstream."""
+
+    def __init__(self):
+        self.latencies: deque[float] = deque(maxlen=200)
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def p95(self) -> float | None:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+_request_stats: dict[str, _RequestStats] = {}
+
+
+def _policy(upstream: str) -> dict:
+    return {**UPSTREAM_RETRY_DEFAULT, **UPSTREAM_RETRY.get(upstream, {})}
+
+
+def _retry_after(exc: Exception) -> float | None:
+    if isinstance(exc, httpx.HTTPStatusError):
+        try:
+            return float(exc.response.headers.get("retry-after", ""))
+        except ValueError:
+            return None
+    return None
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500  # Never retry a 418 IP ban
+    return isinstance(exc, httpx.TransportError)
+
+
+async def _attempt(
+    upstream: str, url: str, params, headers, weight, timeout, sent: asyncio.Event | None = None
+) -> httpx.Response:
+    """One request through the breaker and quota, bounded by timeout.
+
+    sent is set once the request holds its quota and goes out.
+    """
+    quota = get_quota(upstream)
+    async with get_breaker(upstream).guard():
+        await quota.acquire(weight)
+        if sent is not None:
+            sent.set()
+        started = time.perf_counter()
+        try:
+            resp = await asyncio.wait_for(
+                get_client(upstream).get(url, params=params, headers=headers), timeout
+            )
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout(f"{upstream} attempt exceeded {timeout}s") from None
+        quota.observe(resp)
+        resp.raise_for_status()
+    _request_stats[upstream].latencies.append(time.perf_counter() - started)
+    return resp
+
+
+async def _hedged_attempt(upstream: str, url: str, params, headers, weight, policy) -> httpx.Response:
+    """Run an attempt; if it outlasts the upstream's p95, race a second one.
+
+    The p95 clock starts once the first attempt has its quota, and no hedge
+    is sent while the upstream's quota is queued, short or blocked.
+    """
+    stats = _request_stats[upstream]
+    hedge_after = stats.p95() if policy["hedge"] else None
+    if hedge_after is None:
+        return await _attempt(upstream, url, params, headers, weight, policy["timeout"])
+
+    sent = asyncio.Event()
+    tasks = [asyncio.create_task(
+        _attempt(upstream, url, params, headers, weight, policy["timeout"], sent)
+    )]
+    sent_wait = asyncio.create_task(sent.wait())
+    try:
+        await asyncio.wait([tasks[0], sent_wait], return_when=asyncio.FIRST_COMPLETED)
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done and get_quota(upstream).has_spare(weight):
+            stats.hedges += 1
+            tasks.append(asyncio.create_task(
+                _attempt(upstream, url, params, headers, weight, policy["timeout"])
+            ))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        stats.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        sent_wait.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+async def upstream_get(
+    upstream: str,
+    url: str,
+    *,
+    params: dict | None = None,
+    headers: dict | None = None,
+    weight: float = 1,
+) -> httpx.Response:
+    """GET url from an upstream through its breaker, quota and retry policy.
+
+    weight is the request's cost against the upstream's rate limit (Binance
+    request weight). Transport errors, 429 and 5xx are retried with full
+    jitter backoff (longer if Retry-After asks for it, but never past
+    max_backoff). Raises httpx.HTTPStatusError for error responses.
+    """
+    policy = _policy(upstream)
+    _request_stats.setdefault(upstream, _RequestStats())
+    attempt = 0
+    while True:
+        try:
+            return await _hedged_attempt(upstream, url, params, headers, weight, policy)
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            attempt += 1
+            retry_after = _retry_after(e)
+            if (
+                attempt >= policy["attempts"]
+                or not _is_retryable(e)
+                or (retry_after is not None and retry_after > policy["max_backoff"])
+            ):
+                raise
+            delay = random.uniform(0, min(policy["max_backoff"], policy["backoff"] * 2 ** attempt))
+            _request_stats[upstream].retries += 1
+            await asyncio.sleep(max(delay, retry_after or 0))
+
+
+def request_stats() -> dict:
+    return {
+        name: {
+            "p95": round(s.p95(), 3) if s.p95() is not None else None,
+            "retries": s.retries,
+            "hedges": s.hedges,
+            "hedge_wins": s.hedge_wins,
+        }
+        for name, s in _request_stats.items()
+    }
+
+
+@asynccontextmanager
+async def upstream_stream(
+    upstream: str,
+    url: str,
+    *,
+    params: dict | None = None,
+    headers: dict | None = None,
+    weight: float = 1,
+):
+    """Like upstream_get(), but yields the response with its body unread.
+
+    Read it with resp.aiter_bytes() inside the block.
+    """
+    quota = get_quota(upstream)
+    async with get_breaker(upstream).guard():
+        await quota.acquire(weight)
+        async with get_client(upstream).stream(
+            "GET", url, params=params, headers=headers
+        ) as resp:
+            quota.observe(resp)
+            resp.raise_for_status()
+            yield resp
+
+
+async def prewarm_clients():
+    """Open a pooled connection to each upstream so first requests skip the TLS handshake."""
+
+    async def _ping(upstream: str, url: str):
+        try:
+            await get_client(upstream).get(url)
+        except httpx.HTTPError:
+            pass  # Best effort; the real request will retry the connection
+
+    await asyncio.gather(*(
+        _ping(name, cfg["prewarm_url"])
+        for name, cfg in UPSTREAM_HTTP.items()
+        if cfg.get("prewarm_url")
+    ))
+
+
+async def close_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
@@ -0,0 +1,92 @@
+"""JSON decoding of upstream responses off the event loop.
+
+Uses orjson when it is installed. Bodies of at least JSON_OFFLOAD_MIN_BYTES
+are decoded in a worker thread so a large payload (market lists with
+sparklines, the premium index, ticker arrays) does not stall every other
+request. Decode times are recorded per upstream host.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from config import JSON_OFFLOAD_MIN_BYTES
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the stdlib parser
+    orjson = None
+
+
+def loads(data: bytes | str):
+    """Decode JSON with the fastest available parser."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@dataclass
+class DecodeStats:
+    count: int = 0
+    offloaded: int = 0
+    bytes: int = 0
+    # Time the event loop spent decoding inline, and the longest single stall
+    loop_seconds: float = 0.0
+    max_loop_seconds: float = 0.0
+    thread_seconds: float = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "offloaded": self.offloaded,
+            "bytes": self.bytes,
+            "loop_seconds": round(self.loop_seconds, 4),
+            "max_loop_seconds": round(self.max_loop_seconds, 4),
+            "thread_seconds": round(self.thread_seconds, 4),
+        }
+
+
+_stats: dict[str, DecodeStats] = {}
+
+
+async def decode_json(resp: httpx.Response):
+    """Decode a response body, in a worker thread if it is large."""
+    body = resp.content
+    stats = _stats.setdefault(resp.request.url.host, DecodeStats())
+    stats.count += 1
+    stats.bytes += len(body)
+    started = time.perf_counter()
+    if len(body) >= JSON_OFFLOAD_MIN_BYTES:
+        data = await asyncio.to_thread(loads, body)
+        stats.offloaded += 1
+        stats.thread_seconds += time.perf_counter() - started
+    else:
+        data = loads(body)
+        elapsed = time.perf_counter() - started
+        stats.loop_seconds += elapsed
+        stats.max_loop_seconds = max(stats.max_loop_seconds, elapsed)
+    return data
+
+
+def decode_stats() -> dict:
+    return {
+        "parser": "orjson" if orjson is not None else "json",
+        "hosts": {host: s.summary() for host, s in _stats.items()},
+    }
+
+
+def prometheus_lines() -> list[str]:
+    lines = ["# TYPE bedava_json_decode_seconds_total counter"]
+    for host, s in _stats.items():
+        lines.append(f'bedava_json_decode_seconds_total{{host="{host}",where="loop"}} {s.loop_seconds:.6f}')
+        lines.append(f'bedava_json_decode_seconds_total{{host="{host}",where="thread"}} {s.thread_seconds:.6f}')
+    lines.append("# TYPE bedava_json_decode_max_loop_seconds gauge")
+    for host, s in _stats.items():
+        lines.append(f'bedava_json_decode_max_loop_seconds{{host="{host}"}} {s.max_loop_seconds:.6f}')
+    lines.append("# TYPE bedava_json_decode_bytes_total counter")
+    for host, s in _stats.items():
+        lines.append(f'bedava_json_decode_bytes_total{{host="{host}"}} {s.bytes}')
+    return lines
@@ -1,63 +1,236 @@
 """CryptoCompare news client with simple keyword-based sentiment analysis."""
 
-import httpx
-
-from config import CRYPTOCOMPARE_BASE_URL, CACHE_TTL_NEWS, POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS
+import asyncio
+import bisect
+import math
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from config import (
+    CRYPTOCOMPARE_BASE_URL,
+    CACHE_TTL_NEWS,
+    NEWS_ARTICLE_WINDOW,
+    NEWS_CATEGORY_BATCH,
+    NEWS_DECAY_HALF_LIFE,
+    NEWS_COIN_MIN_WEIGHT,
+    BINANCE_SYMBOL_MAP,
+    POSITIVE_KEYWORDS,
+    NEGATIVE_KEYWORDS,
+    KEYWORD_INFLECTIONS,
+)
 from backend.cache.memory_cache import cache
-
-_client: httpx.AsyncClient | None = None
-
-
-def _get_client() -> httpx.AsyncClient:
-    global _client
-    if _client is None or _client.is_closed:
-        _client = httpx.AsyncClient(timeout=30.0)
-    return _client
-
-
-def _analyze_text_sentiment(text: str) -> float:
-    """Simple keyword-based sentiment score. Returns -1.0 to 1.0."""
-    text_lower = text.lower()
-    pos_count = sum(1 for kw in POSITIVE_KEYWORDS if kw in text_lower)
-    neg_count = sum(1 for kw in NEGATIVE_KEYWORDS if kw in text_lower)
+from backend.services.coin_registry import binance_symbol, coin_id_for_symbol
+from backend.services.coingecko import fetch_top_coins
+from backend.services.http_client import upstream_get
+from backend.services.json_decode import decode_json
+
+_POSITIVE = frozenset(kw.lower() for kw in POSITIVE_KEYWORDS)
+_NEGATIVE = frozenset(kw.lower() for kw in NEGATIVE_KEYWORDS)
+
+# Every form of every keyword mapped to the keyword it counts as
+_FORMS = {kw: kw for kw in _POSITIVE | _NEGATIVE} | {
+    form.lower(): kw.lower() for kw, forms in KEYWORD_INFLECTIONS.items() for form in forms
+}
+
+# One alternation over all forms, matched as whole words only: "surged"
+# counts as "surge", while "band" and "highlight" match nothing
+_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(re.escape(f) for f in sorted(_FORMS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+# Scored articles by id, so a refresh only scores articles it has not seen
+_scored: dict[str, dict] = {}
+_SCORED_MAX = 2048
+
+
+def _sentiment_from_keywords(found: set[str]) -> float:
+    pos_count = len(found & _POSITIVE)
+    neg_count = len(found & _NEGATIVE)
     total = pos_count + neg_count
     if total == 0:
         return 0.0
     return (pos_count - neg_count) / total
 
 
+def score_texts(texts: list[str]) -> list[float]:
+    """Score many texts with a single regex pass over their concatenation."""
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + 1
+    found: list[set[str]] = [set() for _ in texts]
+    # The newline separator is a word boundary, so no match spans two texts
+    for match in _KEYWORD_RE.finditer("\n".join(texts)):
+        found[bisect.bisect_right(starts, match.start()) - 1].add(_FORMS[match.group(1).lower()])
+    return [_sentiment_from_keywords(f) for f in found]
+
+
+def _article_key(article: dict) -> str:
+    return str(article.get("id") or article.get("url", ""))
+
+
+def _score_articles(articles: list[dict]) -> list[dict]:
+    """Return scored articles, scoring only those not seen before."""
+    keys = [_article_key(a) for a in articles]
+    new = [(key, a) for key, a in zip(keys, articles) if key not in _scored]
+    scores = score_texts([f"{a.get('title', '')} {a.get('body', '')}" for _, a in new])
+    for (key, article), sentiment in zip(new, scores):
+        _scored[key] = {
+            "title": article.get("title", ""),
+            "url": article.get("url", ""),
+            "source": article.get("source", ""),
+            "published_on": article.get("published_on", 0),
+            "sentiment": round(sentiment, 3),
+            "image": article.get("imageurl", ""),
+        }
+    results = [_scored[key] for key in keys]
+    # Forget the oldest scored articles once the store is full
+    for key in list(_scored)[:max(0, len(_scored) - _SCORED_MAX)]:
+        del _scored[key]
+    return results
+
+
+async def _request_news(categories: str) -> list[dict]:
+    resp = await upstream_get(
+        "cryptocompare",
+        f"{CRYPTOCOMPARE_BASE_URL}/data/v2/news/",
+        params={"categories": categories, "lang": "EN"},
+    )
+    return (await decode_json(resp)).get("Data", [])[:NEWS_ARTICLE_WINDOW]
+
+
 async def fetch_crypto_news(categories: str = "BTC,ETH,Trading") -> list[dict] | None:
     """Fetch latest crypto news from CryptoCompare."""
 
     async def _fetch():
-        client = _get_client()
-        resp = await client.get(
-            f"{CRYPTOCOMPARE_BASE_URL}/data/v2/news/",
-            params={"categories": categories, "lang": "EN"},
-        )
-        resp.raise_for_status()
-        raw = resp.json()
-        articles = raw.get("Data", [])[:20]
-
-        results = []
-        for article in articles:
-            title = article.get("title", "")
-            body = article.get("body", "")
-            sentiment = _analyze_text_sentiment(f"{title} {body}")
-
-            results.append({
-                "title": title,
-                "url": article.get("url", ""),
-                "source": article.get("source", ""),
-                "published_on": article.get("published_on", 0),
-                "sentiment": round(sentiment, 3),
-                "image": article.get("imageurl", ""),
-            })
-        return results
+        return _score_articles(await _request_news(categories))
 
     return await cache.get_or_fetch("crypto_news", CACHE_TTL_NEWS, _fetch)
 
 
+# ──────────────────────────────────────────────
+# Per-coin news index
+# ──────────────────────────────────────────────
+
+_DECAY_TAU = NEWS_DECAY_HALF_LIFE / math.log(2)
+
+
+@dataclass
+class _CoinNews:
+    # Sums weighted by exp((published_on - _index_ref) / tau). Their ratio is
+    # the time-decayed mean sentiment and doesn't change as time passes.
+    weighted: float = 0.0
+    weight: float = 0.0
+    articles: deque = field(default_factory=lambda: deque(maxlen=20))
+
+
+_coin_index: dict[str, _CoinNews] = {}
+_index_ref = time.time()
+_indexed: dict[str, None] = {}  # Article keys already in the index, oldest first
+
+
+def _index_article(key: str, article: dict, scored: dict, symbols: set[str]):
+    """Add one article's sentiment to the aggregates of the coins it covers."""
+    global _index_ref
+    published = article.get("published_on") or time.time()
+    # Keep the exponent small by moving the reference time forward
+    if (published - _index_ref) / _DECAY_TAU > 50:
+        factor = math.exp((_index_ref - published) / _DECAY_TAU)
+        for entry in _coin_index.values():
+            entry.weighted *= factor
+            entry.weight *= factor
+        _index_ref = published
+
+    w = math.exp((published - _index_ref) / _DECAY_TAU)
+    for symbol in symbols:
+        entry = _coin_index.setdefault(symbol, _CoinNews())
+        entry.weighted += w * scored["sentiment"]
+        entry.weight += w
+        entry.articles.appendleft(scored)
+
+    _indexed[key] = None
+    if len(_indexed) > 4096:
+        del _indexed[next(iter(_indexed))]
+
+
+def _coin_summary() -> dict[str, dict]:
+    decay = math.exp((_index_ref - time.time()) / _DECAY_TAU)
+    return {
+        symbol: {
+            "score": round(entry.weighted / entry.weight, 3),
+            "label": _sentiment_label(entry.weighted / entry.weight),
+            "article_count": len(entry.articles),
+            "weight": round(entry.weight * decay, 2),
+            "coin_id": coin_id_for_symbol(symbol),
+        }
+        for symbol, entry in _coin_index.items()
+        if entry.weight > 0
+    }
+
+
+async def fetch_coin_news_sentiment() -> dict[str, dict] | None:
+    """Time-decayed news sentiment per coin symbol, e.g. {"BTC": {score, ...}}.
+
+    News for the categories of the top coins listed on Binance (per the coin
+    registry) is fetched concurrently in batches; articles are deduped by id
+    and only new ones are scored and added to the per-coin index.
+    """
+
+    async def _fetch():
+        coins = await fetch_top_coins() or []
+        symbols = sorted(
+            {s for s in (binance_symbol(c["id"]) for c in coins) if s}
+            or set(BINANCE_SYMBOL_MAP.values())
+        )
+        batches = [
+            ",".join(symbols[i:i + NEWS_CATEGORY_BATCH])
+            for i in range(0, len(symbols), NEWS_CATEGORY_BATCH)
+        ]
+        pages = await asyncio.gather(*(_request_news(b) for b in batches), return_exceptions=True)
+        if all(isinstance(p, BaseException) for p in pages):
+            raise pages[0]
+
+        unique = {}
+        for page in pages:
+            if isinstance(page, BaseException):
+                continue
+            for article in page:
+                unique.setdefault(_article_key(article), article)
+        new = [(k, a) for k, a in unique.items() if k not in _indexed]
+        tracked = set(symbols)
+        for (key, article), scored in zip(new, _score_articles([a for _, a in new])):
+            covered = tracked.intersection(str(article.get("categories", "")).upper().split("|"))
+            _index_article(key, article, scored, covered)
+        return _coin_summary()
+
+    return await cache.get_or_fetch("coin_news", CACHE_TTL_NEWS, _fetch)
+
+
+def pick_coin_sentiment(coin_news: dict | None, coin_id: str, overall: dict) -> dict:
+    """A coin's own news sentiment if it has enough recent coverage, else overall."""
+    symbol = binance_symbol(coin_id)
+    entry = (coin_news or {}).get(symbol) if symbol else None
+    if entry is not None and entry["weight"] >= NEWS_COIN_MIN_WEIGHT:
+        return entry
+    return overall
+
+
+def _sentiment_label(score: float) -> str:
+    if score > 0.2:
+        return "Bullish"
+    elif score > 0.05:
+        return "Slightly Bullish"
+    elif score < -0.2:
+        return "Bearish"
+    elif score < -0.05:
+        return "Slightly Bearish"
+    return "Neutral"
+
+
 async def get_overall_sentiment() -> dict:
     """Calculate overall market sentiment from recent news."""
     news = await fetch_crypto_news()
@@ -71,20 +244,9 @@ async def get_overall_sentiment() -> dict:
     negative = sum(1 for s in scores if s < -0.1)
     neutral = len(scores) - positive - negative
 
-    if avg_score > 0.2:
-        label = "Bullish"
-    elif avg_score > 0.05:
-        label = "Slightly Bullish"
-    elif avg_score < -0.2:
-        label = "Bearish"
-    elif avg_score < -0.05:
-        label = "Slightly Bearish"
-    else:
-        label = "Neutral"
-
     return {
         "score": round(avg_score, 3),
-        "label": label,
+        "label": _sentiment_label(avg_score),
         "article_count": len(news),
         "positive": positive,
         "negative": negative,
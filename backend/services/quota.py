@@ -0,0 +1,184 @@
+"""Per-upstream request quota scheduler with priority classes.
+
+Each upstream gets a token bucket sized to its published rate limit (in
+request weight per minute). Requests wait in a priority queue: user-facing
+cache misses go first, background prewarming next and bulk enrichments
+last. Lower classes must also leave part of the bucket unspent so a burst
+of background work cannot starve users. Live usage headers (Binance
+X-MBX-USED-WEIGHT-1M) and 429/418 responses with Retry-After feed back
+into the bucket, and the refill rate backs off after rate-limit errors.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+
+import httpx
+
+from config import UPSTREAM_QUOTAS, QUOTA_PRIORITY_HEADROOM, QUOTA_MAX_WAIT
+
+
+class Priority(IntEnum):
+    USER = 0        # Cache miss a visitor is waiting on
+    BACKGROUND = 1  # Periodic prewarming
+    BULK = 2        # Fan-out enrichments that can degrade gracefully
+
+
+class QuotaWaitTimeout(Exception):
+    """Raised when a request could not get upstream quota in time."""
+
+
+_priority: ContextVar[Priority] = ContextVar("upstream_priority", default=Priority.USER)
+
+
+@contextmanager
+def request_priority(priority: Priority):
+    """Run upstream requests made inside the block at the given priority.
+
+    Never lowers the class of an already more deferrable context.
+    """
+    token = _priority.set(max(priority, _priority.get()))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamQuota:
+    def __init__(self, name: str, weight_per_minute: float):
+        self.name = name
+        self.capacity = float(weight_per_minute)
+        self.base_rate = weight_per_minute / 60.0
+        self.rate = self.base_rate
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._waiters: list[tuple[int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _headroom(self, priority: int) -> float:
+        return self.capacity * QUOTA_PRIORITY_HEADROOM.get(Priority(priority).name, 0.0)
+
+    def _reserve(self, weight: float, priority: int) -> float:
+        # Requests heavier than the headroom allows would never run; cap the reserve
+        return min(self._headroom(priority), max(0.0, self.capacity - weight))
+
+    def _try_take(self, weight: float, priority: int) -> bool:
+        if time.monotonic() < self.blocked_until:
+            return False
+        self._refill()
+        if self.tokens - weight >= self._reserve(weight, priority):
+            self.tokens -= weight
+            return True
+        return False
+
+    def has_spare(self, weight: float = 1) -> bool:
+        """Whether weight could be taken right now without queueing anyone."""
+        if self._waiters or time.monotonic() < self.blocked_until:
+            return False
+        self._refill()
+        return self.tokens - weight >= self._reserve(weight, int(_priority.get()))
+
+    def _delay_for(self, weight: float, priority: int) -> float:
+        blocked = self.blocked_until - time.monotonic()
+        if blocked > 0:
+            return blocked
+        deficit = weight + self._reserve(weight, priority) - self.tokens
+        return max(0.01, deficit / self.rate)
+
+    async def acquire(self, weight: float = 1, priority: Priority | None = None):
+        """Wait until `weight` tokens are available for this priority class."""
+        priority = int(_priority.get() if priority is None else priority)
+        if not self._waiters and self._try_take(weight, priority):
+            return
+
+        self.throttled += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), weight, future))
+        self._wakeup.set()  # A more urgent request may now head the queue
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), QUOTA_MAX_WAIT)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise QuotaWaitTimeout(f"{self.name} quota wait exceeded {QUOTA_MAX_WAIT}s")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def _dispatch(self):
+        """Hand out tokens to queued requests in priority order."""
+        while self._waiters:
+            priority, _, weight, future = self._waiters[0]
+            if future.done():  # Cancelled or timed out
+                heapq.heappop(self._waiters)
+                continue
+            if self._try_take(weight, priority):
+                heapq.heappop(self._waiters)
+                future.set_result(None)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._delay_for(weight, priority))
+            except asyncio.TimeoutError:
+                pass
+
+    def observe(self, resp: httpx.Response):
+        """Sync the bucket with live usage headers and rate-limit responses."""
+        used = resp.headers.get("x-mbx-used-weight-1m")
+        if used is not None:
+            try:
+                self._refill()
+                self.tokens = min(self.tokens, self.capacity - float(used))
+            except ValueError:
+                pass
+
+        if resp.status_code in (418, 429):
+            try:
+                retry_after = float(resp.headers.get("retry-after", 60))
+            except ValueError:
+                retry_after = 60.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.tokens = 0.0
+            # Multiplicative decrease; recovered additively on success
+            self.rate = max(self.base_rate / 8, self.rate / 2)
+        elif resp.status_code < 400 and self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "tokens": round(self.tokens, 1),
+            "capacity": self.capacity,
+            "rate_per_min": round(self.rate * 60, 1),
+            "queued": len(self._waiters),
+            "throttled": self.throttled,
+            "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+        }
+
+
+_quotas: dict[str, UpstreamQuota] = {}
+
+
+def get_quota(upstream: str) -> UpstreamQuota:
+    """Return the shared quota for an upstream (see UPSTREAM_QUOTAS)."""
+    if upstream not in _quotas:
+        _quotas[upstream] = UpstreamQuota(upstream, UPSTREAM_QUOTAS.get(upstream, 60))
+    return _quotas[upstream]
+
+
+def quota_stats() -> dict:
+    return {name: q.stats() for name, q in _quotas.items()}
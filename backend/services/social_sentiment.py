@@ -1,7 +1,5 @@
 """Social & market buzz aggregator - Market buzz from existing data + LunarCrush trending."""
 
-import httpx
-
 from config import (
     CACHE_TTL_SOCIAL,
     LUNARCRUSH_API_KEY,
@@ -10,15 +8,9 @@ from config import (
 )
 from backend.cache.memory_cache import cache
 from backend.services.coingecko import fetch_top_coins
-
-_client: httpx.AsyncClient | None = None
-
-
-def _get_client() -> httpx.AsyncClient:
-    global _client
-    if _client is None or _client.is_closed:
-        _client = httpx.AsyncClient(timeout=30.0)
-    return _client
+from backend.services.coin_registry import is_pegged
+from backend.services.http_client import upstream_get
+from backend.services.json_decode import decode_json
 
 
 # ──────────────────────────────────────────────
@@ -32,12 +24,6 @@ async def compute_market_buzz() -> list[dict]:
     get higher buzz scores - indicating market attention/interest.
     """
 
-    # Stablecoins to exclude from buzz ranking
-    stablecoins = {"tether", "usd-coin", "dai", "true-usd", "first-digital-usd",
-                    "binance-peg-busd", "usdd", "pax-dollar", "frax", "paypal-usd",
-                    "ethena-usde", "usual-usd", "usd1-wlfi", "tether-gold", "pax-gold",
-                    "staked-ether", "wrapped-bitcoin", "wrapped-steth", "wrapped-eeth"}
-
     async def _fetch():
         coins = await fetch_top_coins()
         if not coins:
@@ -45,8 +31,8 @@ async def compute_market_buzz() -> list[dict]:
 
         results = []
         for coin in coins[:50]:
-            # Skip stablecoins
-            if coin["id"] in stablecoins:
+            # Skip stablecoins and other pegged assets
+            if is_pegged(coin["id"]):
                 continue
             pct_1h = abs(coin.get("price_change_percentage_1h_in_currency") or 0)
             pct_24h = abs(coin.get("price_change_percentage_24h_in_currency")
@@ -101,13 +87,11 @@ async def fetch_trending() -> list[dict] | None:
     """Fetch trending coins from CoinGecko (free, no API key needed)."""
 
     async def _fetch():
-        client = _get_client()
         try:
-            resp = await client.get(
-                "https://api.coingecko.com/api/v3/search/trending",
+            resp = await upstream_get(
+                "coingecko", "https://api.coingecko.com/api/v3/search/trending"
             )
-            resp.raise_for_status()
-            raw = resp.json()
+            raw = await decode_json(resp)
             coins = raw.get("coins", [])
 
             results = []
@@ -143,14 +127,13 @@ async def _fetch_lunarcrush_trending() -> list[dict] | None:
     """Fallback: fetch trending from LunarCrush if API key is set."""
     if not LUNARCRUSH_API_KEY:
         return None
-    client = _get_client()
     try:
-        resp = await client.get(
+        resp = await upstream_get(
+            "lunarcrush",
             "https://lunarcrush.com/api4/public/topics/list/v1",
             headers={"Authorization": f"Bearer {LUNARCRUSH_API_KEY}"},
         )
-        resp.raise_for_status()
-        raw = resp.json()
+        raw = await decode_json(resp)
         topics = raw.get("data", [])[:SOCIAL_TRENDING_COUNT]
         return [
             {
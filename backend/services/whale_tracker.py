@@ -1,61 +1,162 @@
-"""Whale activity tracker using blockchain.info latest blocks."""
+"""Whale activity tracker following new Bitcoin blocks on blockchain.info.
 
-import httpx
-
-from config import CACHE_TTL_WHALES
-from backend.cache.memory_cache import cache
-
-_client: httpx.AsyncClient | None = None
+Each new block height is downloaded once. Its JSON is parsed as it streams
+in, one transaction at a time, and only transactions moving at least
+WHALE_MIN_BTC are kept, as compact tuples in a window of the last
+WHALE_WINDOW_BLOCKS blocks. A cold start scans only the latest block; the
+leader's refresh loop fills in older ones (backfill_whale_window).
+"""
 
+import codecs
+import json
+import re
+from collections import deque
 
-def _get_client() -> httpx.AsyncClient:
-    global _client
-    if _client is None or _client.is_closed:
-        _client = httpx.AsyncClient(timeout=30.0)
-    return _client
+from config import CACHE_TTL_WHALES, WHALE_MIN_BTC, WHALE_WINDOW_BLOCKS, WHALE_MAX_NEW_BLOCKS
+from backend.cache.memory_cache import cache
+from backend.services.http_client import upstream_get, upstream_stream
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = " \t\r\n,"  # Between array items
+_TX_ARRAY = re.compile(r'"tx"\s*:\s*\[')
+
+# (height, [(value_sat, hash, time), ...]) per processed block, oldest first
+_window: deque[tuple[int, list[tuple[int, str, int]]]] = deque(maxlen=WHALE_WINDOW_BLOCKS)
+_last_height: int | None = None
+
+
+def _split_txs(buf: str) -> tuple[list[dict], int, bool]:
+    """Decode the complete transactions at the start of buf.
+
+    Returns them, the number of characters consumed and whether the end of
+    the transaction array was reached.
+    """
+    txs = []
+    pos = 0
+    while True:
+        while pos < len(buf) and buf[pos] in _SEPARATORS:
+            pos += 1
+        if pos == len(buf):
+            return txs, pos, False
+        if buf[pos] == "]":
+            return txs, pos, True
+        try:
+            tx, pos = _decoder.raw_decode(buf, pos)
+        except ValueError:
+            return txs, pos, False  # Transaction continues in the next chunk
+        txs.append(tx)
+
+
+async def _iter_block_txs(resp):
+    """Yield the transaction objects of a block JSON response.
+
+    Text is dropped as soon as the transactions in it have been decoded. A
+    transaction cut off at the end of a chunk is decoded again only once its
+    buffered part has doubled, so a huge one costs O(log n) attempts rather
+    than one per chunk.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    in_array = False
+    retry_at = 0  # Buffer length before the cut-off transaction is retried
+    async for chunk in resp.aiter_bytes():
+        buf += text_decoder.decode(chunk)
+        if not in_array:
+            match = _TX_ARRAY.search(buf)
+            if match is None:
+                buf = buf[-32:]  # The marker may straddle chunks
+                continue
+            buf = buf[match.end():]
+            in_array = True
+        if len(buf) < retry_at:
+            continue
+
+        txs, pos, ended = _split_txs(buf)
+        for tx in txs:
+            yield tx
+        if ended:
+            return
+        buf = buf[pos:]
+        retry_at = 2 * len(buf)
+
+    if in_array:
+        for tx in _split_txs(buf)[0]:
+            yield tx
+
+
+async def _scan_block(height: int) -> list[tuple[int, str, int]]:
+    """Stream one block and return its whale transactions."""
+    min_sats = int(WHALE_MIN_BTC * 1e8)
+    whales = []
+    async with upstream_stream(
+        "blockchain_info",
+        f"https://blockchain.info/block-height/{height}",
+        params={"format": "json", "cors": "true"},
+    ) as resp:
+        async for tx in _iter_block_txs(resp):
+            total_out = sum(o.get("value", 0) for o in tx.get("out", []))
+            if total_out >= min_sats:
+                whales.append((total_out, tx.get("hash", "")[:16], tx.get("time", 0)))
+    return whales
+
+
+def _window_results() -> list[dict]:
+    rows = [(tx, height) for height, txs in _window for tx in txs]
+    rows.sort(key=lambda r: -r[0][0])
+    return [
+        {
+            "hash": tx_hash + "...",
+            "value_btc": round(value / 1e8, 2),
+            "value_usd": None,
+            "time": tx_time,
+            "block_id": height,
+        }
+        for (value, tx_hash, tx_time), height in rows[:10]
+    ]
 
 
 async def fetch_whale_transactions() -> list[dict] | None:
     """Fetch recent large Bitcoin transactions (>50 BTC) from blockchain.info."""
 
     async def _fetch():
-        client = _get_client()
+        global _last_height
         try:
-            # Get latest block hash
-            resp = await client.get("https://blockchain.info/q/latesthash")
-            resp.raise_for_status()
-            latest_hash = resp.text.strip()
-
-            # Get block data with transactions
-            resp2 = await client.get(
-                f"https://blockchain.info/rawblock/{latest_hash}",
-                params={"cors": "true"},
-            )
-            resp2.raise_for_status()
-            block = resp2.json()
-
-            results = []
-            for tx in block.get("tx", []):
-                total_out = sum(o.get("value", 0) for o in tx.get("out", []))
-                value_btc = total_out / 1e8
-                if value_btc >= 50:
-                    results.append({
-                        "hash": tx.get("hash", "")[:16] + "...",
-                        "value_btc": round(value_btc, 2),
-                        "value_usd": None,
-                        "time": tx.get("time", ""),
-                        "block_id": block.get("height"),
-                    })
-
-            # Sort by value descending, take top 10
-            results.sort(key=lambda x: -x["value_btc"])
-            return results[:10] if results else _get_fallback_whale_data()
+            # Only blocks above the last processed height are downloaded
+            resp = await upstream_get("blockchain_info", "https://blockchain.info/q/getblockcount")
+            latest = int(resp.text.strip())
+            # A cold start scans one block; older ones are backfilled later
+            first = latest
+            if _last_height is not None:
+                first = max(latest - WHALE_MAX_NEW_BLOCKS + 1, _last_height + 1)
+            for height in range(first, latest + 1):
+                _window.append((height, await _scan_block(height)))
+                _last_height = height
+
+            results = _window_results()
+            return results if results else _get_fallback_whale_data()
         except Exception:
+            # Let the cache keep serving the last real transactions if it has them
+            if cache.get_even_if_stale("whale_txs") is not None:
+                raise
             return _get_fallback_whale_data()
 
     return await cache.get_or_fetch("whale_txs", CACHE_TTL_WHALES, _fetch)
 
 
+async def backfill_whale_window():
+    """Scan the block just below the window until it holds WHALE_WINDOW_BLOCKS."""
+    if not _window or len(_window) >= WHALE_WINDOW_BLOCKS:
+        return
+    height = _window[0][0] - 1
+    whales = await _scan_block(height)
+    # New blocks may have been appended meanwhile; appendleft on a full
+    # window would push out the newest one, so drop the backfilled block
+    if not _window or len(_window) >= WHALE_WINDOW_BLOCKS or _window[0][0] != height + 1:
+        return
+    _window.appendleft((height, whales))
+    cache.set("whale_txs", _window_results() or _get_fallback_whale_data(), CACHE_TTL_WHALES)
+
+
 def _get_fallback_whale_data() -> list[dict]:
     """Fallback whale data when API is unavailable."""
     return [
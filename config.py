@@ -1,5 +1,7 @@
 """BedavaFinans Configuration - All constants and settings."""
 
+import os
+
 # === API URLs ===
 COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
 BINANCE_BASE_URL = "https://api.binance.com/api/v3"
@@ -9,7 +11,8 @@ CRYPTOCOMPARE_BASE_URL = "https://min-api.cryptocompare.com"
 BLOCKCHAIR_BASE_URL = "https://api.blockchair.com"
 
 # === General ===
-TOP_N_COINS = 100
+TOP_N_COINS = 100  # Fetched in pages of COINGECKO_MARKETS_PAGE_SIZE
+COINGECKO_MARKETS_PAGE_SIZE = 250  # /coins/markets per_page maximum
 SIGNAL_COINS_COUNT = 15  # Top N coins for automatic signal computation
 TOP_MOVERS_COUNT = 10
 AUTO_REFRESH_INTERVAL = 120  # seconds - frontend polling
@@ -17,6 +20,10 @@ AUTO_REFRESH_INTERVAL = 120  # seconds - frontend polling
 # === Cache TTLs (seconds) ===
 CACHE_TTL_MARKET_DATA = 120    # 2 min
 CACHE_TTL_OHLC = 300           # 5 min
+KLINES_MAX_CANDLES = 1000      # Candles kept per cached Binance kline series (one request)
+# Intervals aggregated locally from a finer cached series (interval -> base).
+# Weeks come from days: 104 weeks of hourly candles would need 18 requests.
+KLINES_RESAMPLE = {"4h": "1h", "1w": "1d"}
 CACHE_TTL_GLOBAL = 120         # 2 min
 CACHE_TTL_FEAR_GREED = 3600    # 1 hour
 CACHE_TTL_DERIVATIVES = 300    # 5 min
@@ -25,6 +32,101 @@ CACHE_TTL_NEWS = 900           # 15 min
 CACHE_TTL_SOCIAL = 600         # 10 min (social sentiment)
 CACHE_TTL_ARBITRAGE = 300      # 5 min (funding rate arbitrage)
 CACHE_TTL_SOLANA = 300         # 5 min (Solana ecosystem)
+CACHE_TTL_COIN_REGISTRY = 86400  # 1 day (coin universe and Binance symbol mapping)
+
+# === Cache Behaviour ===
+CACHE_STALE_WHILE_REVALIDATE = True  # Serve expired entries while one background refresh runs
+CACHE_MAX_STALENESS = 600            # seconds past TTL after which callers block on a refresh
+CACHE_MAX_BYTES = 96 * 1024 * 1024   # Estimated byte budget before LRU eviction kicks in
+CACHE_NEGATIVE_TTL = 15              # seconds a failed fetch is remembered before retrying
+
+# Cache key families for metrics (prefix match, first wins; anything else is "other")
+CACHE_KEY_FAMILIES = [
+    "markets_top", "global_data", "solana_ecosystem_", "detail_", "ohlc_",
+    "binance_klines_", "premium_index", "spot_prices", "volume_bursts", "oi_", "ls_ratio_", "arbitrage_data",
+    "coin_registry", "fear_greed", "crypto_news", "coin_news", "whale_txs", "trending_coins", "market_buzz",
+]
+
+# === Rendered Response Cache ===
+RESPONSE_CACHE_MAX_ENTRIES = 256  # (route, query) renderings kept in memory
+RESPONSE_COMPRESS_MIN_BYTES = 1024  # Smaller bodies are sent uncompressed
+
+# === Cache Snapshots (warm starts) ===
+# Must survive a machine restart: on Fly this points into the mounted volume
+CACHE_SNAPSHOT_PATH = os.environ.get("CACHE_SNAPSHOT_PATH", "data/cache_snapshot.jsonl.gz")
+CACHE_SNAPSHOT_INTERVAL = 300      # seconds between snapshot writes
+CACHE_SNAPSHOT_MAX_AGE = 6 * 3600  # entries older than this (and past their TTL) are not restored
+CACHE_SNAPSHOT_LOAD_BUDGET = 2.0   # seconds the startup loader may spend reading
+
+# === Multi-Worker Shared Cache ===
+# Enable when running uvicorn with --workers > 1: one worker (elected through a
+# file lock) runs all refreshes and publishes the cache to shared memory, the
+# others serve from it and hand their cache misses to the leader over a Unix
+# socket, so all upstream requests (and quotas) stay in one process.
+CACHE_SHARED_ENABLED = False
+CACHE_SHARED_LOCK_PATH = "/tmp/bedavafinans_leader.lock"
+CACHE_SHARED_SOCKET_PATH = "/tmp/bedavafinans_leader.sock"
+CACHE_SHARED_LEADER_TIMEOUT = 30   # seconds a follower waits for the leader to fill a miss
+CACHE_SHARED_STORE_PATH = "/dev/shm/bedavafinans_cache"  # directory, one file per key
+CACHE_SHARED_PUBLISH_INTERVAL = 5  # seconds between leader publishes (when changed)
+CACHE_SHARED_POLL_INTERVAL = 2     # seconds between follower syncs / election attempts
+
+# === Upstream HTTP Clients ===
+HTTP_CONNECT_TIMEOUT = 5.0    # TCP + TLS handshake
+HTTP_READ_TIMEOUT = 20.0      # between bytes of a response
+HTTP_WRITE_TIMEOUT = 10.0
+HTTP_POOL_TIMEOUT = 5.0       # waiting for a free pooled connection
+HTTP_KEEPALIVE_EXPIRY = 90.0  # idle seconds before a pooled connection is dropped
+JSON_OFFLOAD_MIN_BYTES = 256 * 1024  # Larger upstream bodies are decoded in a worker thread
+
+# Per-upstream pool size, HTTP/2 support and a cheap URL used to open a
+# connection at startup (None = no prewarm)
+UPSTREAM_HTTP = {
+    "coingecko": {"max_connections": 6, "http2": True, "prewarm_url": f"{COINGECKO_BASE_URL}/ping"},
+    "binance": {"max_connections": 10, "http2": True, "prewarm_url": f"{BINANCE_BASE_URL}/ping"},
+    "binance_futures": {"max_connections": 10, "http2": True, "prewarm_url": f"{BINANCE_FUTURES_URL}/fapi/v1/ping"},
+    "alternative_me": {"max_connections": 2, "http2": False, "prewarm_url": None},
+    "cryptocompare": {"max_connections": 4, "http2": True, "prewarm_url": None},
+    "blockchain_info": {"max_connections": 2, "http2": True, "prewarm_url": None},
+    "lunarcrush": {"max_connections": 2, "http2": True, "prewarm_url": None},
+}
+
+# === Upstream Quotas ===
+# Request weight per minute each upstream may receive from this process
+# (Binance endpoints have individual weights; other APIs count 1 per call)
+UPSTREAM_QUOTAS = {
+    "coingecko": 25,          # free tier allows ~30 calls/min
+    "binance": 4800,          # 6000 weight/min per IP, with spare room
+    "binance_futures": 1900,  # 2400 weight/min per IP
+    "alternative_me": 60,
+    "cryptocompare": 50,
+    "blockchain_info": 30,
+    "lunarcrush": 10,
+}
+# Share of the bucket each priority class must leave unspent for higher ones
+QUOTA_PRIORITY_HEADROOM = {"USER": 0.0, "BACKGROUND": 0.15, "BULK": 0.35}
+QUOTA_MAX_WAIT = 15  # seconds a request may queue for quota before giving up
+
+# === Upstream Retries & Hedging ===
+# attempts: tries per request; timeout: per-attempt deadline (s);
+# backoff/max_backoff: bounds of the jittered exponential backoff (s);
+# hedge: send a second attempt once the first is slower than the upstream's
+# observed p95 latency. Entries in UPSTREAM_RETRY override the default.
+UPSTREAM_RETRY_DEFAULT = {"attempts": 3, "timeout": 10.0, "backoff": 0.5, "max_backoff": 8.0, "hedge": False}
+UPSTREAM_RETRY = {
+    "coingecko": {"attempts": 2, "hedge": True},
+    "binance": {"timeout": 5.0, "hedge": True},
+    "binance_futures": {"timeout": 5.0, "hedge": True},
+    "alternative_me": {"attempts": 2},
+    "cryptocompare": {"hedge": True},
+    "blockchain_info": {"timeout": 8.0, "hedge": True},
+    "lunarcrush": {"attempts": 1},
+}
+HEDGE_MIN_SAMPLES = 20  # Latency samples needed before an upstream's p95 is trusted
+
+# === Upstream Circuit Breakers ===
+CIRCUIT_FAILURE_THRESHOLD = 5  # consecutive upstream failures before the circuit opens
+CIRCUIT_RESET_TIMEOUT = 30     # seconds an open circuit waits before a half-open probe
 
 # === Technical Analysis Parameters ===
 RSI_PERIOD = 14
@@ -43,13 +145,60 @@ RSI_OVERSOLD = 30
 RSI_OVERBOUGHT = 70
 VOLUME_ANOMALY_STD_MULTIPLIER = 2.0
 
+# === Volume Sampling (Binance bulk 24h tickers) ===
+VOLUME_SAMPLE_INTERVAL = 60       # seconds between bulk /ticker/24hr samples (weight 80 each)
+VOLUME_HISTORY_POINTS = 240       # interval volumes kept per pair (4h at 60s)
+VOLUME_BURST_MIN_SAMPLES = 15     # samples needed before a pair's baseline is trusted
+
 # === Signal Layer Weights ===
 WEIGHT_TECHNICAL = 0.40
 WEIGHT_VOLUME = 0.25
 WEIGHT_SENTIMENT = 0.20
 WEIGHT_DERIVATIVES = 0.15
 
+# === Upstream Fan-out ===
+BINANCE_FANOUT_CONCURRENCY = 8  # Max in-flight Binance requests per derivatives fan-out
+ARBITRAGE_OI_WEIGHT_BUDGET = 50  # Binance weight one arbitrage fill may spend on open interest
+
+# === Binance WebSocket Streams ===
+# When enabled, kline series, the premium index and spot prices are kept
+# current from combined streams instead of REST polling
+BINANCE_STREAM_ENABLED = False
+BINANCE_SPOT_WS_URL = "wss://stream.binance.com:9443/stream"
+BINANCE_FUTURES_WS_URL = "wss://fstream.binance.com/stream"
+BINANCE_STREAM_KLINE_INTERVALS = ["1h", "1d"]  # Base intervals (see KLINES_RESAMPLE)
+BINANCE_STREAM_FLUSH_INTERVAL = 2    # seconds between batched cache writes
+# premium_index / spot_prices are rewritten (bumping their version and so
+# every response built from them) only after a material move, at most this often
+BINANCE_STREAM_SNAPSHOT_INTERVAL = 30
+BINANCE_STREAM_MIN_CHANGE = 0.001    # relative mark/spot price move that counts as material
+BINANCE_STREAM_MIN_FUNDING_CHANGE = 0.00001  # absolute funding rate change that counts
+BINANCE_STREAM_MAX_BACKOFF = 60      # max seconds between reconnect attempts
+CACHE_TTL_ARBITRAGE_STREAMING = 30   # arbitrage table rebuilt from the live premium index
+
+# === Whale Tracker ===
+WHALE_MIN_BTC = 50          # Transactions moving at least this much are tracked
+WHALE_WINDOW_BLOCKS = 6     # Recent blocks whose whale transactions are kept
+WHALE_MAX_NEW_BLOCKS = 3    # Blocks downloaded per poll when catching up
+
+# === Coin Registry ===
+# CoinGecko coins are matched to Binance USDT pairs by symbol; when several
+# coins share a symbol, the best ranked of the top COIN_REGISTRY_RANKED wins.
+COIN_REGISTRY_RANKED = 500
+COIN_REGISTRY_STABLE_CATEGORY = "stablecoins"
+# Other coins tracking another asset's price (excluded from buzz rankings)
+COIN_REGISTRY_PEGGED_CATEGORIES = ["wrapped-tokens", "liquid-staking-tokens", "tokenized-gold"]
+# Used until the registry is first built (or while its build keeps failing)
+COIN_REGISTRY_FALLBACK_STABLECOINS = {
+    "tether", "usd-coin", "dai", "true-usd", "first-digital-usd", "binance-peg-busd",
+    "usdd", "pax-dollar", "frax", "paypal-usd", "ethena-usde", "usual-usd", "usd1-wlfi",
+}
+COIN_REGISTRY_FALLBACK_PEGGED = COIN_REGISTRY_FALLBACK_STABLECOINS | {
+    "tether-gold", "pax-gold", "staked-ether", "wrapped-bitcoin", "wrapped-steth", "wrapped-eeth",
+}
+
 # === Binance Symbol Mapping (CoinGecko ID → Binance symbol) ===
+# Overrides for the coin registry's automatic mapping; also the streamed set
 BINANCE_SYMBOL_MAP = {
     "bitcoin": "BTC",
     "ethereum": "ETH",
@@ -129,6 +278,10 @@ SOLANA_SUBCATEGORIES = {
 }
 
 # === Sentiment Keywords ===
+NEWS_ARTICLE_WINDOW = 50  # Latest articles scored per fetch (one CryptoCompare page)
+NEWS_CATEGORY_BATCH = 6   # Coin categories per per-coin news request (fetched concurrently)
+NEWS_DECAY_HALF_LIFE = 6 * 3600  # seconds until an article counts half in per-coin sentiment
+NEWS_COIN_MIN_WEIGHT = 2.0  # Decayed article weight needed before a coin's own sentiment is used
 POSITIVE_KEYWORDS = [
     "bullish", "surge", "rally", "gain", "pump", "moon", "breakout",
     "adoption", "partnership", "upgrade", "launch", "approval", "growth",
@@ -139,6 +292,39 @@ NEGATIVE_KEYWORDS = [
     "regulation", "lawsuit", "fraud", "scam", "sell", "liquidation",
     "fear", "decline", "loss", "warning", "risk",
 ]
+# Inflected forms that count as their keyword; all matching is whole-word
+KEYWORD_INFLECTIONS = {
+    "surge": ["surges", "surged", "surging"],
+    "rally": ["rallies", "rallied", "rallying"],
+    "gain": ["gains", "gained", "gaining"],
+    "pump": ["pumps", "pumped", "pumping"],
+    "moon": ["mooning"],
+    "breakout": ["breakouts"],
+    "partnership": ["partnerships"],
+    "upgrade": ["upgrades", "upgraded", "upgrading"],
+    "launch": ["launches", "launched", "launching"],
+    "approval": ["approvals"],
+    "record": ["records"],
+    "high": ["highs"],
+    "buy": ["buys", "buying"],
+    "accumulate": ["accumulates", "accumulated", "accumulating"],
+    "crash": ["crashes", "crashed", "crashing"],
+    "dump": ["dumps", "dumped", "dumping"],
+    "plunge": ["plunges", "plunged", "plunging"],
+    "hack": ["hacks", "hacked"],
+    "exploit": ["exploits", "exploited"],
+    "ban": ["bans", "banned", "banning"],
+    "regulation": ["regulations"],
+    "lawsuit": ["lawsuits"],
+    "scam": ["scams", "scammed"],
+    "sell": ["sells", "selling"],
+    "liquidation": ["liquidations"],
+    "fear": ["fears", "feared"],
+    "decline": ["declines", "declined", "declining"],
+    "loss": ["losses"],
+    "warning": ["warnings"],
+    "risk": ["risks"],
+}
 
 # === Social Sentiment ===
 LUNARCRUSH_API_KEY = ""  # Free tier - get from lunarcrush.com/developers
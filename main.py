@@ -7,12 +7,22 @@ from collections import defaultdict
 from contextlib import asynccontextmanager
 from pathlib import Path
 
+import httpx
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse, Response, JSONResponse
 
-from config import HOST, PORT, CACHE_TTL_MARKET_DATA
+from config import (
+    HOST, PORT, CACHE_TTL_MARKET_DATA, CACHE_SNAPSHOT_INTERVAL, CACHE_SHARED_ENABLED,
+    BINANCE_STREAM_ENABLED, VOLUME_SAMPLE_INTERVAL,
+)
 from backend.api.routes import router as api_router
+from backend.cache.memory_cache import cache
+from backend.cache.response_cache import conditional_response
+from backend.cache.shared import WorkerCoordinator, current_request_path
+from backend.cache.snapshot import load_snapshot, save_snapshot
+from backend.services.http_client import prewarm_clients, close_clients
+from backend.services.binance_stream import run_binance_streams
 
 # Ensure project root is on path
 sys.path.insert(0, str(Path(__file__).parent))
@@ -30,34 +40,109 @@ RATE_LIMIT_WINDOW = 60  # seconds
 async def periodic_refresh():
     """Background task to pre-warm cache periodically."""
     from backend.services.coingecko import fetch_top_coins, fetch_global, fetch_solana_coins
+    from backend.services.coin_registry import fetch_coin_registry
     from backend.services.fear_greed import fetch_fear_greed
-    from backend.services.news_sentiment import get_overall_sentiment
+    from backend.services.news_sentiment import get_overall_sentiment, fetch_coin_news_sentiment
     from backend.services.social_sentiment import get_social_overview
+    from backend.services.whale_tracker import fetch_whale_transactions, backfill_whale_window
+    from backend.services.quota import Priority, request_priority
 
     while True:
         try:
-            await fetch_top_coins()
-            await fetch_global()
-            await fetch_fear_greed(limit=30)
-            await get_overall_sentiment()
-            await get_social_overview()
-            await fetch_solana_coins()
+            # Prewarming yields upstream quota to requests visitors wait on
+            with request_priority(Priority.BACKGROUND):
+                await fetch_coin_registry()  # Rebuilt once a day
+                await fetch_top_coins()
+                await fetch_global()
+                await fetch_fear_greed(limit=30)
+                await get_overall_sentiment()
+                await fetch_coin_news_sentiment()
+                await get_social_overview()
+                await fetch_solana_coins()
+                await fetch_whale_transactions()
+                await backfill_whale_window()  # One older block per cycle
         except Exception as e:
             print(f"[BedavaFinans] Refresh error: {e}")
         await asyncio.sleep(CACHE_TTL_MARKET_DATA)
 
 
+async def periodic_volume_sampling():
+    """Background task sampling every Binance pair's volume on a fixed cadence."""
+    from backend.services.binance import fetch_quote_volumes
+    from backend.analysis.volume_anomaly import volume_samples
+    from backend.services.quota import Priority, request_priority
+
+    next_at = time.monotonic()
+    while True:
+        try:
+            with request_priority(Priority.BACKGROUND):
+                totals = await fetch_quote_volumes()
+            volume_samples.record(totals, time.time())
+            bursts = {"pairs": volume_samples.bursts(), "interval": round(volume_samples.interval)}
+            cache.set("volume_bursts", bursts, VOLUME_SAMPLE_INTERVAL * 3)
+        except Exception as e:
+            print(f"[BedavaFinans] Volume sampling error: {e}")
+        # Keep the cadence fixed regardless of how long the request took
+        next_at = max(next_at + VOLUME_SAMPLE_INTERVAL, time.monotonic())
+        await asyncio.sleep(next_at - time.monotonic())
+
+
+# Client address of in-process requests replaying followers' cache misses;
+# not a valid IP, so no real connection can claim it
+WARM_CLIENT = ("leader-warm", 0)
+
+
+async def warm_api_path(path: str):
+    """Serve an API GET in-process so its cache entries get filled (leader side)."""
+    transport = httpx.ASGITransport(app=app, client=WARM_CLIENT)
+    async with httpx.AsyncClient(transport=transport, base_url="http://leader") as client:
+        await client.get(path)
+
+
+async def periodic_snapshot():
+    """Background task to persist the cache for warm restarts."""
+    while True:
+        await asyncio.sleep(CACHE_SNAPSHOT_INTERVAL)
+        try:
+            await save_snapshot()
+        except Exception as e:
+            print(f"[BedavaFinans] Snapshot error: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Manage background refresh task lifecycle."""
-    task = asyncio.create_task(periodic_refresh())
+    """Manage cache snapshot, upstream clients and background task lifecycle."""
+    restored = await load_snapshot()
+    if restored:
+        print(f"[BedavaFinans] Restored {restored} cache entries from snapshot")
+    # Open upstream connections in the background while the first requests arrive
+    tasks = [asyncio.create_task(prewarm_clients())]
+    leader_jobs = [periodic_refresh, periodic_volume_sampling, periodic_snapshot]
+    if BINANCE_STREAM_ENABLED:
+        leader_jobs.append(run_binance_streams)
+    coordinator = None
+    if CACHE_SHARED_ENABLED:
+        # Only the elected leader refreshes; other workers follow its store
+        coordinator = WorkerCoordinator(warm=warm_api_path)
+        tasks.append(asyncio.create_task(coordinator.run(*leader_jobs)))
+    else:
+        tasks += [asyncio.create_task(job()) for job in leader_jobs]
     print(f"[BedavaFinans] Dashboard starting at http://localhost:{PORT}")
     yield
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    is_leader = coordinator is None or coordinator.is_leader
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if is_leader:
+        try:
+            await save_snapshot()
+        except Exception as e:
+            print(f"[BedavaFinans] Snapshot error: {e}")
+    await close_clients()
 
 
 app = FastAPI(title="BedavaFinans - Crypto Signal Dashboard", lifespan=lifespan)
@@ -67,8 +152,10 @@ app = FastAPI(title="BedavaFinans - Crypto Signal Dashboard", lifespan=lifespan)
 async def rate_limit_middleware(request: Request, call_next):
     """Rate limit API requests (60 req/min per IP)."""
     path = request.url.path
-    if path.startswith("/api/") and path != "/api/health":
+    if path.startswith("/api/") and path not in ("/api/health", "/api/metrics"):
         client_ip = request.client.host if request.client else "unknown"
+        if client_ip == WARM_CLIENT[0]:
+            return await call_next(request)  # Already counted in the follower
         now = time.time()
         # Clean old entries
         rate_limit_store[client_ip] = [
@@ -86,9 +173,24 @@ async def rate_limit_middleware(request: Request, call_next):
 
 @app.middleware("http")
 async def add_cache_headers(request: Request, call_next):
-    """Add cache-control headers for static assets."""
-    response = await call_next(request)
+    """Add cache-control headers for static assets and validators for the API."""
     path = request.url.path
+    if path in ("/api/health", "/api/metrics"):
+        # Live status; never cached by browsers, probes or CDNs
+        response = await call_next(request)
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    if path.startswith("/api/") and request.method == "GET":
+        # Track which cache entries the handler reads to derive ETag and max-age
+        token = current_request_path.set(f"{path}?{request.url.query}")
+        try:
+            with cache.track() as versions:
+                response = await call_next(request)
+        finally:
+            current_request_path.reset(token)
+        return await conditional_response(request, response, versions)
+
+    response = await call_next(request)
     if path.startswith("/static/"):
         if path.endswith((".css", ".js")):
             response.headers["Cache-Control"] = "public, max-age=60, stale-while-revalidate=86400"